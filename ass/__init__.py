@@ -1,36 +1,71 @@
 """Asynchronous OpenAI Assistants API Client."""
-from asyncio import run
+from asyncio import Lock, run
+from contextlib import AsyncExitStack
+from functools import cached_property
+from importlib import import_module
 import sys
+from typing import TYPE_CHECKING
 
-from click import argument, group, option, pass_context, pass_obj, File
-from geopy.geocoders import Nominatim  # type: ignore
-import httpx
-from openai import AsyncOpenAI
-from playwright.async_api import async_playwright
+from click import argument, group, option, pass_context, pass_obj, File, Group
+from click.utils import make_default_short_help
 
-from ass.geopy import httpx_adapter
-from ass.owm import AsyncOpenWeatherMap
 from ass.snd import play
 
-from ass.oai import load_tools
-import ass.tools.browser
-import ass.tools.dialogs
-import ass.tools.emacs
-import ass.tools.ocr
-import ass.tools.orf
-import ass.tools.owm
-import ass.tools.result
-import ass.tools.shell
-import ass.tools.smtp
-import ass.tools.tmux
-import ass.tools.tts
-import ass.tools.wikipedia
-import ass.tools.z3
-from ass import simple, tui, vision, dictation, shell
-load_tools()
-
-
-@group()
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+class LazyGroup(Group):
+    """A command group which only imports a subcommand when it is needed.
+
+    `lazy_commands` maps names to `('module:attr', short_help)`, the short
+    help is listed by `--help` without importing the module.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *self.lazy_commands])
+
+    def get_command(self, ctx, name):
+        if name in self.lazy_commands:
+            module, attr = self.lazy_commands[name][0].split(':')
+            return getattr(import_module(module), attr)
+
+        return super().get_command(ctx, name)
+
+    def format_commands(self, ctx, formatter):
+        names = self.list_commands(ctx)
+        limit = formatter.width - 6 - max(map(len, names), default=0)
+        rows = []
+        for name in names:
+            if name in self.lazy_commands:
+                _, help = self.lazy_commands[name]
+                help = make_default_short_help(help, limit)
+            elif (command := super().get_command(ctx, name)) and not command.hidden:
+                help = command.get_short_help_str(limit)
+            else:
+                continue
+            rows.append((name, help))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+
+@group(cls=LazyGroup, lazy_commands={
+    'ask': ('ass.simple:ask', "Ask a single question"),
+    'cache': ('ass.cache:cli', "Inspect and prune on-disk caches"),
+    'chat': ('ass.tui:chat', "Interactively chat with an assistant"),
+    'describe-image': ('ass.vision:describe_image', "Obtain image descriptions."),
+    'stt': ('ass.dictation:stt', "Speech-To-Text"),
+    'bash': ('ass.shell:bash', "Command-line generator for Bash"),
+    'zsh': ('ass.shell:zsh', "Command-line generator for Zsh"),
+    'serve': ('ass.daemon:serve',
+        "Keep clients and assistants alive for the shell integration"
+    )
+})
 @option("--openai-api-key")
 @option("--openai-base-url")
 @option("--openweathermap-api-key")
@@ -39,15 +74,6 @@ def cli(ctx, **kwargs):
     ctx.obj = clients(**kwargs)
 
 
-cli.add_command(simple.ask)
-cli.add_command(tui.chat)
-cli.add_command(vision.describe_image)
-cli.add_command(dictation.stt)
-cli.add_command(shell.bash)
-cli.add_command(shell.zsh)
-
-
-
 @cli.command(help="Convert Text to Speech")
 @option("--model", default="tts-1-hd")
 @option("--voice", default="nova")
@@ -59,39 +85,96 @@ def tts(client, model, voice, speed, format, input):
     run(atts(client.openai, model, voice, speed, format, input.read()))
 
 
-async def atts(openai: AsyncOpenAI, model, voice, speed, format, input):
-    response = await openai.audio.speech.create(
-        input=input, model=model, voice=voice, speed=speed,
-        response_format=format
+async def atts(openai: 'AsyncOpenAI', model, voice, speed, format, input):
+    from ass.oai import stream_speech
+
+    speech = stream_speech(openai.audio.speech, input,
+        model=model, voice=voice, speed=speed, response_format=format
     )
-    bytes = await response.aread()
     if not sys.stdout.isatty():
-        sys.stdout.buffer.write(bytes)
+        async for chunk in speech:
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
     else:
-        await play([bytes])
+        await play([speech])
 
 
 class clients:
+    """Lazily constructed API clients shared by commands and tools."""
+
     def __init__(self, *,
         openai_api_key, openai_base_url, openweathermap_api_key
     ):
-        self.http = httpx.AsyncClient()
-        self.openai = AsyncOpenAI(
-            api_key=openai_api_key, base_url=openai_base_url,
+        self.openai_api_key = openai_api_key
+        self.openai_base_url = openai_base_url
+        self.openweathermap_api_key = openweathermap_api_key
+        self._stack = AsyncExitStack()
+        self._playwright = None
+        self._playwright_lock = Lock()
+        self._browsers = None
+        self._browsers_lock = Lock()
+
+    @cached_property
+    def http(self):
+        import httpx
+
+        return httpx.AsyncClient()
+
+    @cached_property
+    def openai(self):
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(
+            api_key=self.openai_api_key, base_url=self.openai_base_url,
             http_client=self.http
         )
-        self.geocoder = Nominatim(
+
+    @cached_property
+    def geocoder(self):
+        from geopy.geocoders import Nominatim  # type: ignore
+        from ass.geopy import httpx_adapter
+
+        return Nominatim(
             user_agent=__package__,
             adapter_factory=httpx_adapter(self.http)
         )
-        self.owm = AsyncOpenWeatherMap(
-            api_key=openweathermap_api_key, http_client=self.http
+
+    @cached_property
+    def owm(self):
+        from ass.owm import AsyncOpenWeatherMap
+
+        return AsyncOpenWeatherMap(
+            api_key=self.openweathermap_api_key, http_client=self.http
         )
-        self._playwright = async_playwright()
+
+    async def playwright(self):
+        """Start the playwright driver on first use."""
+
+        async with self._playwright_lock:
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await self._stack.enter_async_context(
+                    async_playwright()
+                )
+
+        return self._playwright
+
+    async def browsers(self):
+        """Create the browser page pool on first use."""
+
+        async with self._browsers_lock:
+            if self._browsers is None:
+                from ass.browsers import BrowserPool
+
+                self._browsers = BrowserPool(await self.playwright())
+                self._stack.push_async_callback(self._browsers.close)
+
+        return self._browsers
 
     async def __aenter__(self):
-        self.playwright = await self._playwright.__aenter__()
+        await self._stack.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        return await self._playwright.__aexit__(exc_type, exc_value, traceback)
+        return await self._stack.__aexit__(exc_type, exc_value, traceback)
@@ -1,8 +1,11 @@
 ass-ask-bash() {
-  local transform=(
-    ass ask --instructions "$ASS_ASK_BASH_INSTRUCTIONS" --result
-    $ASS_ASK_BASH_TOOLS
+  local args=(
+    --instructions "$ASS_ASK_BASH_INSTRUCTIONS" --result $ASS_ASK_BASH_TOOLS
   )
+  local transform=(ass ask "${args[@]}")
+  if [[ -S "$ASS_SOCKET" ]]
+  then transform=("$ASS_PYTHON" -S "$ASS_CLIENT" "${args[@]}")
+  fi
   if [[ -n "$READLINE_LINE" ]]
   then READLINE_LINE="$("${transform[@]}" <<< "$READLINE_LINE")"
        READLINE_POINT=0
@@ -0,0 +1,120 @@
+"""Pool of browser pages shared by concurrent tool calls."""
+
+from asyncio import Lock
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+@dataclass(slots=True)
+class Session:
+    context: Any
+    idle: List[Any] = field(default_factory=list)
+    uses: Dict[Any, int] = field(default_factory=dict)
+    leased: int = 0
+
+
+class BrowserPool:
+    """Hand out pages of isolated browser contexts.
+
+    Every session gets a browser context of its own, so cookies and storage
+    are not shared between sessions.  Concurrent calls within a session run
+    on separate pages, a call prefers the page its session used last so
+    multi-step browsing continues where it left off.  Pages are recycled
+    after `max_uses` leases or once their JavaScript heap exceeds
+    `max_heap` bytes (only measurable in chromium).
+    """
+
+    def __init__(self, playwright, *,
+        warm=1, max_uses=50, max_heap=512 << 20, max_sessions=8
+    ):
+        self.playwright = playwright
+        self.warm = warm
+        self.max_uses = max_uses
+        self.max_heap = max_heap
+        self.max_sessions = max_sessions
+        self._browsers: Dict[str, Any] = {}
+        self._sessions: 'OrderedDict[Tuple[str, Hashable], Session]' = OrderedDict()
+        self._lock = Lock()
+
+    @asynccontextmanager
+    async def page(self, browser: str, session: Hashable):
+        state = await self._session(browser, session)
+        page = state.idle.pop() if state.idle else await self._new_page(state)
+        state.uses[page] += 1
+        state.leased += 1
+        try:
+            yield page
+            if await self._worn(page, state.uses[page]):
+                page = await self._recycle(state, page)
+        finally:
+            state.leased -= 1
+            state.idle.append(page)
+
+    async def close(self):
+        async with self._lock:
+            for state in self._sessions.values():
+                await state.context.close()
+            self._sessions.clear()
+            for browser in self._browsers.values():
+                await browser.close()
+            self._browsers.clear()
+
+    async def _session(self, browser: str, session: Hashable) -> Session:
+        async with self._lock:
+            key = (browser, session)
+            if key not in self._sessions:
+                if browser not in self._browsers:
+                    self._browsers[browser] = await getattr(
+                        self.playwright, browser
+                    ).launch(headless=True)
+                state = Session(await self._browsers[browser].new_context())
+                for _ in range(self.warm):
+                    state.idle.append(await self._new_page(state))
+                self._sessions[key] = state
+                await self._evict(key)
+            self._sessions.move_to_end(key)
+
+            return self._sessions[key]
+
+    async def _new_page(self, state: Session):
+        page = await state.context.new_page()
+        state.uses[page] = 0
+
+        return page
+
+    async def _worn(self, page, uses: int) -> bool:
+        if uses >= self.max_uses:
+            return True
+        try:
+            heap = await page.evaluate(
+                "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+            )
+        except Exception:
+            return False
+
+        return heap > self.max_heap
+
+    async def _recycle(self, state: Session, page):
+        """Replace a page by a fresh one showing the same URL."""
+
+        url = page.url
+        del state.uses[page]
+        await page.close()
+        page = await self._new_page(state)
+        if url != 'about:blank':
+            try:
+                await page.goto(url)
+            except Exception:
+                pass
+
+        return page
+
+    async def _evict(self, keep):
+        idle = [
+            key for key, state in self._sessions.items()
+            if not state.leased and key != keep
+        ]
+        for key in idle[:max(0, len(self._sessions) - self.max_sessions)]:
+            await self._sessions.pop(key).context.close()
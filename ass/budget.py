@@ -0,0 +1,193 @@
+"""Keep function tool outputs within a token budget.
+
+Outputs exceeding their budget are shortened by one of several strategies.
+Whatever does not fit is kept in memory under a cursor, so the model can
+read further parts on request.
+"""
+
+from collections import OrderedDict
+from difflib import unified_diff
+import json
+import re
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens, assuming 4 characters each."""
+
+    return (len(text) + 3) // 4
+
+
+def apply(strategy: str, key: str, output: str, budget: int) -> str:
+    """Shorten a serialized tool output according to `strategy`."""
+
+    return strategies[strategy](key, output, budget)
+
+
+def read(cursor: str, part: str) -> str:
+    if cursor not in _parts:
+        return "Unknown or expired cursor."
+    parts = _parts[cursor]
+    _parts.move_to_end(cursor)
+    if part not in parts:
+        return f"Unknown part, choose one of: {', '.join(parts)}"
+
+    return parts[part]
+
+
+def truncate(key: str, output: str, budget: int) -> str:
+    if estimate_tokens(output) <= budget:
+        return output
+    full = _text(output)
+    text = _cut(full, budget * 4)
+
+    return json.dumps({
+        'content': text,
+        'truncated_tokens': estimate_tokens(full) - estimate_tokens(text)
+    })
+
+
+def paginate(key: str, output: str, budget: int) -> str:
+    if estimate_tokens(output) <= budget:
+        return output
+    pages = _split(_text(output), budget * 4)
+
+    return _with_cursor({str(n): page for n, page in enumerate(pages, 1)})
+
+
+def sections(key: str, output: str, budget: int) -> str:
+    """Return the lead and an outline, other sections are read on request."""
+
+    if estimate_tokens(output) <= budget:
+        return output
+    text = _text(output)
+    parts: Dict[str, str] = {}
+    title = 'Introduction'
+    start = 0
+    for match in _heading.finditer(text):
+        parts[title] = text[start:match.start()]
+        title = match.group('title')
+        if title in parts:
+            title = f"{title} #{sum(t.startswith(title) for t in parts) + 1}"
+        start = match.start()
+    parts[title] = text[start:]
+    # Text often starts with a heading, leaving the introduction empty.
+    # Long sections are split into pages of their own.
+    pages: Dict[str, str] = {}
+    for title, body in parts.items():
+        if body.strip():
+            split = _split(body, budget * 2)
+            pages.update({title: body} if len(split) == 1 else {
+                f"{title} ({n}/{len(split)})": page
+                for n, page in enumerate(split, 1)
+            })
+
+    return _with_cursor(pages)
+
+
+def diff(key: str, output: str, budget: int) -> str:
+    """Only report changes since the previous call with the same arguments.
+
+    `key` must identify the caller as well, a diff against output another
+    caller was shown is useless.  Outputs within budget are passed on as is.
+    """
+
+    previous = _previous.get(key)
+    _remember(_previous, key, output)
+    if previous is None or estimate_tokens(output) <= budget:
+        return paginate(key, output, budget)
+    if previous == output:
+        return json.dumps({'unchanged': True})
+    changes = '\n'.join(unified_diff(
+        _lines(previous), _lines(output),
+        'previous', 'current', lineterm='', n=1
+    ))
+    if len(changes) >= len(output):
+        return paginate(key, output, budget)
+
+    return paginate(key, json.dumps({'diff': changes}), budget)
+
+
+strategies: Dict[str, Callable[[str, str, int], str]] = {
+    'truncate': truncate,
+    'paginate': paginate,
+    'sections': sections,
+    'diff': diff
+}
+
+
+def _with_cursor(parts: Dict[str, str]) -> str:
+    cursor = uuid4().hex[:12]
+    _remember(_parts, cursor, parts)
+    first, *rest = parts.items()
+
+    return json.dumps({
+        'part': first[0], 'content': first[1],
+        'cursor': cursor, 'more_parts': [title for title, _ in rest],
+        'hint': "Use read_more with this cursor to fetch other parts."
+    })
+
+
+def _text(output: str) -> str:
+    """Unwrap outputs which are JSON strings."""
+
+    try:
+        value = json.loads(output)
+    except ValueError:
+        return output
+
+    return value if isinstance(value, str) else output
+
+
+def _lines(output: str) -> List[str]:
+    """Split an output into lines, also within multi-line string fields."""
+
+    try:
+        value = json.loads(output)
+    except ValueError:
+        return output.splitlines()
+    if isinstance(value, str):
+        return value.splitlines()
+    if not isinstance(value, dict):
+        return json.dumps(value, indent=1).splitlines()
+    lines = []
+    for key, field in value.items():
+        if isinstance(field, str) and '\n' in field:
+            lines.append(f"{key}:")
+            lines.extend(field.splitlines())
+        else:
+            lines.append(f"{key}: {json.dumps(field)}")
+
+    return lines
+
+
+def _cut(text: str, size: int) -> str:
+    if len(text) <= size:
+        return text
+    end = text.rfind('\n', size // 2, size)
+
+    return text[:end if end > 0 else size]
+
+
+def _split(text: str, size: int) -> List[str]:
+    pages = []
+    while len(text) > size:
+        page = _cut(text, size)
+        pages.append(page)
+        text = text[len(page):]
+    pages.append(text)
+
+    return pages
+
+
+def _remember(store: OrderedDict, key, value, limit=64) -> None:
+    store[key] = value
+    store.move_to_end(key)
+    while len(store) > limit:
+        store.popitem(last=False)
+
+
+_heading = re.compile(r'^(?:=+|#+)[ \t]*(?P<title>[^=#\n]+?)[ \t]*=*$', re.M)
+_parts: 'OrderedDict[str, Dict[str, str]]' = OrderedDict()
+_previous: 'OrderedDict[str, str]' = OrderedDict()
@@ -0,0 +1,195 @@
+"""Size-bounded on-disk caches with least-recently-used eviction."""
+
+from functools import cached_property
+import os
+from pathlib import Path
+import sqlite3
+from time import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from click import group, option
+
+
+Value = Union[bytes, str]
+
+
+class Cache:
+    """A key/value store kept in an SQLite database.
+
+    Entries older than the `ttl` passed to `get` are treated as missing.
+    Once the total size exceeds `max_size`, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path, max_size: int):
+        self.path = Path(path).expanduser()
+        self.max_size = max_size
+
+    @cached_property
+    def db(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, value BLOB, size INTEGER,
+            created REAL, used REAL
+        )""")
+        db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+
+        return db
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Value]:
+        row = self.db.execute(
+            "SELECT value, created FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        now = time()
+        if ttl is not None and now - created > ttl:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._removed([key])
+            return None
+        self.db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+
+        return value
+
+    def put(self, key: str, value: Value, size: Optional[int] = None) -> None:
+        now = time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value) if size is None else size, now, now)
+        )
+        self.evict()
+
+    def evict(self, max_size: Optional[int] = None) -> List[str]:
+        """Remove least recently used entries beyond `max_size`."""
+
+        return self._delete("""DELETE FROM entries WHERE key IN (
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY used DESC) AS total
+                FROM entries
+            ) WHERE total > ?
+        ) RETURNING key""", (self.max_size if max_size is None else max_size,))
+
+    def prune(self, *,
+        max_size: Optional[int] = None, unused_for: Optional[float] = None
+    ) -> List[str]:
+        """Remove entries not used for `unused_for` seconds, then evict."""
+
+        removed = []
+        if unused_for is not None:
+            removed = self._delete(
+                "DELETE FROM entries WHERE used < ? RETURNING key",
+                (time() - unused_for,)
+            )
+
+        return removed + self.evict(max_size)
+
+    def stats(self) -> Tuple[int, int]:
+        """Return the number and total size of entries."""
+
+        count, size = self.db.execute(
+            "SELECT COUNT(*), TOTAL(size) FROM entries"
+        ).fetchone()
+
+        return count, int(size)
+
+    def _delete(self, query: str, params) -> List[str]:
+        keys = [key for key, in self.db.execute(query, params).fetchall()]
+        self._removed(keys)
+
+        return keys
+
+    def _removed(self, keys: Iterable[str]) -> None:
+        pass
+
+
+class FileCache(Cache):
+    """Files in a directory, indexed by a Cache of their sizes.
+
+    Files are written under a temporary name and renamed into place, so
+    readers never see partial files.
+    """
+
+    def __init__(self, dir, max_size: int, suffix=''):
+        self.dir = Path(dir).expanduser()
+        self.suffix = suffix
+        super().__init__(self.dir / 'index.sqlite', max_size)
+
+    def file(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key[2:]}{self.suffix}"
+
+    def lookup(self, key: str, ttl: Optional[float] = None) -> Optional[Path]:
+        """Return the file stored under `key`, if any."""
+
+        if self.get(key, ttl) is None:
+            return None
+        file = self.file(key)
+        if not file.exists():
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+
+        return file
+
+    def partial(self, key: str) -> Path:
+        """Return a temporary name to write the file for `key` to."""
+
+        file = self.file(key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+
+        return file.with_name(f"{file.name}.{os.getpid()}.{id(file)}.part")
+
+    def commit(self, key: str, partial: Path) -> Path:
+        """Move a completely written file into place and index it."""
+
+        file = self.file(key)
+        size = partial.stat().st_size
+        partial.replace(file)
+        self.put(key, '', size=size)
+
+        return file
+
+    def _removed(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.file(key).unlink(missing_ok=True)
+
+
+def caches() -> Dict[str, Cache]:
+    from ass.oai import speech_cache, tool_cache
+    from ass.vision import cache as descriptions
+
+    return {
+        'speech': speech_cache, 'tools': tool_cache,
+        'descriptions': descriptions
+    }
+
+
+@group(help="Inspect and prune on-disk caches")
+def cli():
+    pass
+
+
+@cli.command(help="Show the number and size of cached entries")
+def stats():
+    for name, cache in caches().items():
+        count, size = cache.stats() if cache.path.exists() else (0, 0)
+        print(f"{name:<12} {count:>7} entries {size / 1e6:>9.1f} of "
+              f"{cache.max_size / 1e6:.0f} MB  {cache.path}")
+
+
+@cli.command(help="Remove old or excess cached entries")
+@option('--unused-for', type=float, metavar='DAYS',
+        help="Remove entries not used for this many days."
+)
+@option('--max-size', type=float, metavar='MB',
+        help="Evict least recently used entries beyond this size."
+)
+def prune(unused_for, max_size):
+    for name, cache in caches().items():
+        if cache.path.exists():
+            removed = cache.prune(
+                unused_for=None if unused_for is None else unused_for * 86400,
+                max_size=None if max_size is None else int(max_size * 1e6)
+            )
+            print(f"{name:<12} {len(removed):>7} entries removed")
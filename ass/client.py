@@ -0,0 +1,45 @@
+"""Thin client for `ass serve`.
+
+This only uses the standard library and is meant to be run as a script
+(python3 -S client.py ...) so that starting it costs next to nothing.
+Arguments are those of `ass ask`, the question is read from stdin.
+If no server is listening, `ass ask` is executed instead.
+"""
+import json
+import os
+import socket
+import sys
+
+
+def main(argv):
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        os.execvp('ass', ['ass', 'ask', *argv])
+
+    with sock:
+        sock.sendall(json.dumps({
+            'argv': argv, 'cwd': os.getcwd(), 'input': sys.stdin.read()
+        }).encode() + b'\n')
+        for line in sock.makefile('r', encoding='utf-8'):
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            for name, stream in (('stdout', sys.stdout), ('stderr', sys.stderr)):
+                if name in message:
+                    stream.write(message[name])
+                    stream.flush()
+
+    return 1
+
+
+def socket_path():
+    return os.environ.get('ASS_SOCKET') or os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or '/tmp', f"ass-{os.getuid()}.sock"
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
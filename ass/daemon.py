@@ -0,0 +1,87 @@
+"""Serve `ask` requests from the shell integration on a Unix socket."""
+
+from asyncio import Lock, run, start_unix_server
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
+import os
+import sys
+import traceback
+
+from click import ClickException, command, option, pass_obj
+from click.exceptions import Exit
+
+from ass import simple
+from ass.client import socket_path
+
+
+@command(help="Keep clients and assistants alive for the shell integration")
+@option("--socket", "path", default=socket_path, show_default="$ASS_SOCKET",
+        help="Unix socket to listen on.")
+@pass_obj
+def serve(client, path):
+    run(aserve(client, path))
+
+
+async def aserve(client, path, *, max_request=256 << 20):
+    # Requests redirect stdout/stderr and change directory, so they are
+    # handled one at a time.
+    lock = Lock()
+
+    async def handle(reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            async with lock:
+                with redirect_stdout(_Forward(writer, 'stdout')), \
+                     redirect_stderr(_Forward(writer, 'stderr')):
+                    code = await ask(client, **request)
+        except Exception:
+            writer.write(_message(stderr=traceback.format_exc()))
+            code = 1
+        writer.write(_message(exit=code))
+        await writer.drain()
+        writer.close()
+
+    async with client as client:
+        if os.path.exists(path):
+            os.unlink(path)
+        # A request carries all of stdin on a single line.
+        server = await start_unix_server(handle, path, limit=max_request)
+        os.chmod(path, 0o600)
+        async with server:
+            await server.serve_forever()
+
+
+async def ask(client, *, argv, cwd, input) -> int:
+    os.chdir(cwd)
+    try:
+        with simple.ask.make_context('ask', argv, obj=client) as ctx:
+            spec = dict(ctx.params)
+            files = spec.pop('files')
+            message_file = spec.pop('message_file')
+            text = input if message_file.name == '<stdin>' else message_file.read()
+            await simple.answer(client, spec, files, text)
+    except ClickException as error:
+        error.show(file=sys.stderr)
+        return error.exit_code
+    except Exit as exit:
+        return exit.exit_code
+
+    return 0
+
+
+class _Forward(io.TextIOBase):
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.writer.write(_message(**{self.name: text}))
+        return len(text)
+
+
+def _message(**kwargs) -> bytes:
+    return json.dumps(kwargs).encode() + b'\n'
@@ -1,31 +1,36 @@
 from abc import abstractmethod
-from asyncio import Semaphore, gather, sleep
-from contextlib import asynccontextmanager, AsyncExitStack
+from asyncio import (Event, Queue, Semaphore, create_task, gather,
+                     get_running_loop, sleep, timeout as asyncio_timeout,
+                     timeout_at as asyncio_timeout_at, to_thread)
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from dataclasses import dataclass
+import fcntl
+from functools import partial
 import hashlib
-from importlib.util import spec_from_file_location, module_from_spec
 import inspect
+from itertools import count
 import json
 import os
 from pathlib import Path
-import traceback
-from typing import (Any, AsyncIterator, Awaitable, Callable, ClassVar, Dict,
-                    List, Tuple, Type)
-
-import click
-from openai import AsyncOpenAI
+from random import uniform
+from time import monotonic, time
+from typing import (Any, AsyncIterator, Awaitable, BinaryIO, Callable,
+                    ClassVar, Dict, Iterable, List, Optional, Tuple, Type,
+                    TypeVar)
+
+from openai import (APIConnectionError, AsyncOpenAI, InternalServerError,
+                    NotFoundError, RateLimitError)
 from openai.resources.audio.speech import AsyncSpeech
-from openai.resources.beta.assistants import AsyncAssistants
 from openai.resources.beta.threads import AsyncThreads
 from openai.resources.beta.threads.runs import AsyncRuns
-from openai.resources.beta.vector_stores import AsyncVectorStores
 from openai.types import ChatModel
 from openai.types.audio import SpeechModel
 from openai.types.beta import (
-    AssistantToolParam, CodeInterpreterToolParam, FileSearchToolParam,
+    Assistant, AssistantToolParam, CodeInterpreterToolParam, FileSearchToolParam,
     FunctionToolParam
 )
 from openai.types.beta.assistant_stream_event import MessageDeltaEvent
+from openai.types.beta.vector_stores import VectorStoreFileBatch
 from openai.types.beta.assistant_create_params import (
     AssistantCreateParams, ToolResources, ToolResourcesCodeInterpreter,
     ToolResourcesFileSearch
@@ -43,65 +48,240 @@ from openai.types.beta.threads.required_action_function_tool_call import (
     Function
 )
 import pydantic
+from pydantic_core import to_json
+
+from ass import budget, tools as registry
+from ass.cache import Cache, FileCache
+
+
+T = TypeVar('T')
 
 
 @asynccontextmanager
 async def make_assistant(openai: AsyncOpenAI, files, /, *,
     instructions: str,
     model: ChatModel,
+    cache_file="~/.cache/ass/assistants.json",
+    ttl=7 * 24 * 60 * 60,
+    max_entries=32,
+    index_timeout: Optional[float] = None,
+    progress: Optional[Callable[[str], None]] = None,
     **kwargs
-) -> AsyncIterator[AssistantCreateParams]:
-    tools = {k: v for k, v in _alltools().items() if k in kwargs if kwargs[k]}
+) -> AsyncIterator[Assistant]:
+    """Provide an assistant, reusing a cached one with identical parameters.
+
+    Assistants (and their files and vector stores) are kept on the server
+    and indexed locally by a hash of their parameters and file contents.
+    Entries unused for `ttl` seconds or exceeding `max_entries` are deleted.
+    `progress` is called with messages about uploading and indexing files.
+    """
+
+    tools = _tools(name for name, enabled in kwargs.items() if enabled)
     params = AssistantCreateParams(
         instructions=instructions,
         model=model,
-        tools=tools.values()
+        tools=list(tools.values())
     )
-
-    async with AsyncExitStack() as stack:
-        if files:
-            tool_resources = ToolResources()
-            remote_files = await stack.enter_async_context(
-                temporary_files(openai, files)
+    digests = await gather(*(to_thread(file_digest, file) for file in files))
+    key = hashlib.sha256(
+        json.dumps([params, digests], sort_keys=True).encode()
+    ).hexdigest()
+    path = Path(cache_file).expanduser()
+    index = _read_index(path)
+
+    assistant = None
+    entry: Optional[Dict[str, Any]] = index.get(key)
+    if entry:
+        try:
+            assistant = await openai.beta.assistants.retrieve(
+                entry['assistant']
             )
-            if 'code_interpreter' in tools:
-                tool_resources['code_interpreter'] = ToolResourcesCodeInterpreter(
-                    file_ids=[file.id for file in remote_files]
-                )
-            if 'file_search' in tools:
-                store = await stack.enter_async_context(
-                    temporary_vector_store(openai.beta.vector_stores)
-                )
-                batch = await openai.beta.vector_stores.file_batches.create(
-                    vector_store_id=store.id,
-                    file_ids=[file.id for file in remote_files]
+        except NotFoundError:
+            await _delete_cached(openai, index.pop(key), index)
+
+    if assistant is None:
+        entry = {
+            'assistant': None, 'files': [], 'vector_store': None
+        }
+        try:
+            if files:
+                tool_resources = ToolResources()
+                entry['files'] = await upload_files(openai,
+                    zip(digests, files), progress=progress
                 )
-                while batch.status == "in_progress":
-                    await sleep(1)
-                    batch = await openai.beta.vector_stores.file_batches.retrieve(
-                        batch.id, vector_store_id=store.id
+                if 'code_interpreter' in tools:
+                    tool_resources['code_interpreter'] = ToolResourcesCodeInterpreter(
+                        file_ids=entry['files']
+                    )
+                if 'file_search' in tools:
+                    store = await openai.beta.vector_stores.create()
+                    entry['vector_store'] = store.id
+                    batches = openai.beta.vector_stores.file_batches
+                    batch = await batches.create(
+                        vector_store_id=store.id, file_ids=entry['files']
                     )
+                    if batch.status == "in_progress":
+                        batch = await poll(
+                            partial(batches.retrieve, batch.id,
+                                vector_store_id=store.id
+                            ),
+                            until=lambda batch: batch.status != "in_progress",
+                            timeout=index_timeout,
+                            progress=progress and (
+                                lambda batch: progress(file_counts(batch))
+                            )
+                        )
 
-                tool_resources['file_search'] = ToolResourcesFileSearch(
-                    vector_store_ids=[store.id]
-                )
+                    tool_resources['file_search'] = ToolResourcesFileSearch(
+                        vector_store_ids=[store.id]
+                    )
 
-            params['tool_resources'] = tool_resources
+                params['tool_resources'] = tool_resources
 
-        assistant = await stack.enter_async_context(
-            temporary_assistant(openai.beta.assistants, **params)
-        )
+            assistant = await openai.beta.assistants.create(**params)
+            entry['assistant'] = assistant.id
+        except BaseException:
+            await _delete_cached(openai, entry, _read_index(path))
+            raise
 
-        yield assistant
+    entry['used'] = time()
+    expired: List[Dict[str, Any]] = []
 
+    def merge(index):
+        index[key] = entry
+        expired.extend(_expire(index, ttl, max_entries))
 
-@asynccontextmanager
-async def temporary_assistant(assistants: AsyncAssistants, **kwargs):
-    assistant = await assistants.create(**kwargs)
+    # Other processes may have changed the index while we were waiting
+    # for the server.
+    index = _update_index(path, merge)
+    await gather(*(_delete_cached(openai, old, index) for old in expired))
+
+    yield assistant
+
+
+async def poll(retrieve: Callable[[], Awaitable[T]], /, *,
+    until: Callable[[T], bool],
+    interval=0.1, max_interval=5.0, backoff=2.0, jitter=0.1,
+    timeout: Optional[float] = None,
+    progress: Optional[Callable[[T], None]] = None
+) -> T:
+    """Poll a long-running server-side operation until it is done.
+
+    The delay between calls grows exponentially (with some random jitter)
+    from `interval` to `max_interval`.  Raises TimeoutError if `until` is
+    not satisfied within `timeout` seconds.
+    """
+
+    async with asyncio_timeout(timeout):
+        while True:
+            result = await retrieve()
+            if progress:
+                progress(result)
+            if until(result):
+                return result
+            await sleep(interval * uniform(1 - jitter, 1 + jitter))
+            interval = min(interval * backoff, max_interval)
+
+
+def file_counts(batch: VectorStoreFileBatch) -> str:
+    """Describe the progress of a vector store file batch."""
+
+    counts = batch.file_counts
+    return "".join([
+        f"{batch.status}: {counts.completed}/{counts.total} files indexed",
+        f", {counts.failed} failed" if counts.failed else ""
+    ])
+
+
+def file_digest(file: BinaryIO) -> str:
+    """Return the SHA-256 of a file, leaving it positioned at the start."""
+
+    digest = hashlib.file_digest(file, 'sha256').hexdigest()
+    file.seek(0)
+
+    return digest
+
+
+def _read_index(path: Path) -> Dict[str, Dict[str, Any]]:
     try:
-        yield assistant
-    finally:
-        await assistants.delete(assistant.id)
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(path: Path, index: Dict[str, Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}")
+    tmp.write_text(json.dumps(index))
+    tmp.replace(path)
+
+
+@contextmanager
+def _locked(path: Path):
+    """Hold an exclusive lock on `path` shared by all processes.
+
+    The index itself is replaced on every write, so the lock is taken on
+    a separate file next to it.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _update_index(path: Path, update: Callable[[Dict[str, Any]], None]
+) -> Dict[str, Any]:
+    """Apply `update` to a freshly read index and write it back."""
+
+    with _locked(path):
+        index = _read_index(path)
+        update(index)
+        _write_index(path, index)
+
+    return index
+
+
+def _expire(index, ttl, max_entries) -> List[Dict[str, Any]]:
+    """Remove and return cached assistants which expired or exceed the LRU
+    limit."""
+
+    now = time()
+    by_age = sorted(index, key=lambda key: index[key]['used'], reverse=True)
+
+    return [
+        index.pop(key) for n, key in enumerate(by_age)
+        if n >= max_entries or now - index[key]['used'] > ttl
+    ]
+
+
+async def _delete_cached(openai: AsyncOpenAI, entry: Dict[str, Any], index,
+    files_index="~/.cache/ass/files.json"
+) -> None:
+    """Delete an assistant and the files no other cached assistant uses."""
+
+    async def delete(resource, id, **kwargs):
+        try:
+            await resource.delete(id, **kwargs)
+        except NotFoundError:
+            pass
+
+    in_use = {id for other in index.values() for id in other['files']}
+    unused = [id for id in entry['files'] if id not in in_use]
+    await gather(
+        *([delete(openai.beta.assistants, entry['assistant'])]
+          if entry['assistant'] else []),
+        *([delete(openai.beta.vector_stores, entry['vector_store'])]
+          if entry['vector_store'] else []),
+        *(delete(openai.files, id) for id in unused)
+    )
+    if unused:
+        def forget(index):
+            for digest, id in list(index.items()):
+                if id in unused:
+                    del index[digest]
+
+        _update_index(Path(files_index).expanduser(), forget)
 
 
 @asynccontextmanager
@@ -113,47 +293,96 @@ async def temporary_thread(threads: AsyncThreads, **kwargs):
         await threads.delete(thread.id)
 
 
-@asynccontextmanager
-async def temporary_vector_store(vector_stores: AsyncVectorStores, **kwargs):
-    vector_store = await vector_stores.create(**kwargs)
-    try:
-        yield vector_store
-    finally:
-        await vector_stores.delete(vector_store.id)
-
-
-@asynccontextmanager
-async def temporary_files(openai: AsyncOpenAI, files):
-    exceptions = []
-    uploaded = []
-    for item in await gather(
-        *(openai.files.create(file=file, purpose='assistants')
-          for file in files),
-        return_exceptions=True
-    ):
-        if isinstance(item, BaseException):
-            exceptions.append(item)
-        else:
-            uploaded.append(item)
+async def upload_files(openai: AsyncOpenAI,
+    files: Iterable[Tuple[str, BinaryIO]], /, *,
+    concurrency=4, retries=3,
+    index_file="~/.cache/ass/files.json",
+    progress: Optional[Callable[[str], None]] = None
+) -> List[str]:
+    """Upload (digest, file) pairs and return their file IDs.
+
+    Files which have been uploaded before (according to their SHA-256
+    digest) are reused.  At most `concurrency` files are streamed from
+    disk at once, and transient errors are retried for each file.
+    """
+
+    path = Path(index_file).expanduser()
+    index = _read_index(path)
+    added: Dict[str, str] = {}
+    gone: Dict[str, str] = {}
+    semaphore = Semaphore(concurrency)
+    create = openai.with_options(max_retries=0).files.create
+    uploaded: List[int] = []
+
+    async def upload(digest: str, file: BinaryIO) -> str:
+        async with semaphore:
+            if digest in index:
+                try:
+                    return (await openai.files.retrieve(index[digest])).id
+                except NotFoundError:
+                    gone[digest] = index.pop(digest)
+
+            size = file.seek(0, os.SEEK_END)
+            for attempt in range(retries + 1):
+                file.seek(0)
+                try:
+                    remote = await create(file=file, purpose='assistants')
+                    break
+                except (APIConnectionError, InternalServerError,
+                        RateLimitError):
+                    if attempt == retries:
+                        raise
+                    await sleep(2 ** attempt * uniform(0.5, 1.5))
+
+            added[digest] = remote.id
+            uploaded.append(size)
+
+            return remote.id
+
+    start = monotonic()
     try:
-        if exceptions:
-            raise exceptions[0]
-        yield uploaded
+        results = await gather(*(upload(*pair) for pair in files),
+            return_exceptions=True
+        )
     finally:
-        await gather(
-            *(openai.files.delete(file.id) for file in uploaded)
+        def merge(index):
+            for digest, id in gone.items():
+                if index.get(digest) == id:
+                    del index[digest]
+            index.update(added)
+
+        if added or gone:
+            _update_index(path, merge)
+    if progress and uploaded:
+        seconds = max(monotonic() - start, 1e-3)
+        megabytes = sum(uploaded) / 1e6
+        progress(
+            f"Uploaded {len(uploaded)} files ({megabytes:.1f} MB) "
+            f"in {seconds:.1f}s, {megabytes / seconds:.1f} MB/s"
         )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    return results
 
 
 async def stream_a_run(runs: AsyncRuns, /, *,
     function_tool_args: List[Any] = [], **kwargs
 ):
     async def call_tool(
-        tool_call: RequiredActionFunctionToolCall
+        run: Run, tool_call: RequiredActionFunctionToolCall
     ) -> ToolOutput:
+        # Results are useless once the run expired on the server.
+        deadline = None
+        if run.expires_at:
+            deadline = get_running_loop().time() + run.expires_at - time()
+
         return {
             'tool_call_id': tool_call.id,
-            'output': await _call(tool_call.function, *function_tool_args)
+            'output': await _call(tool_call.function, *function_tool_args,
+                deadline=deadline
+            )
         }
 
     stream = await runs.create(stream=True, **kwargs)
@@ -178,13 +407,77 @@ async def stream_a_run(runs: AsyncRuns, /, *,
                         stream = await runs.submit_tool_outputs(stream=True,
                             thread_id=run.thread_id, run_id=run.id,
                             tool_outputs=await gather(
-                                *map(call_tool, tool_calls)
+                                *map(partial(call_tool, run), tool_calls)
                             )
                         )
 
     await stream.close()
 
 
+async def coalesce(events: AsyncIterator[Any], /, *,
+    interval=1 / 30, max_bytes=4096, max_pending=256
+) -> AsyncIterator[Any]:
+    """Merge consecutive text tokens from `events` into frames.
+
+    Text is passed on at most every `interval` seconds, or as soon as
+    `max_bytes` characters are pending.  A run status change flushes
+    pending text and is passed on immediately.  Other events (the raw
+    stream events preceding every token) are passed on as they arrive,
+    without flushing.  At most `max_pending` events are read ahead of the
+    consumer.
+    """
+
+    queue: Queue = Queue(max_pending)
+    done = object()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put((event, None))
+        except Exception as error:
+            await queue.put((done, error))
+        else:
+            await queue.put((done, None))
+
+    loop = get_running_loop()
+    task = create_task(pump())
+    try:
+        text: List[str] = []
+        size = 0
+        deadline = 0.0
+        while True:
+            try:
+                async with asyncio_timeout_at(deadline if text else None):
+                    event, error = await queue.get()
+            except TimeoutError:
+                event = None
+            if isinstance(event, str):
+                if not text:
+                    deadline = loop.time() + interval
+                text.append(event)
+                size += len(event)
+                if size < max_bytes:
+                    continue
+            elif event is not None and event is not done \
+                    and not isinstance(event, Run):
+                yield event
+                continue
+            if text:
+                yield ''.join(text)
+                text, size = [], 0
+            if event is done:
+                if error:
+                    raise error
+                return
+            if event is not None and not isinstance(event, str):
+                yield event
+    finally:
+        # Let the run and its tool calls wind down before the caller
+        # goes on to clean up.
+        task.cancel()
+        await gather(task, return_exceptions=True)
+
+
 def function(**kwargs):
     """Register an async def with keyword arguments as a function tool."""
 
@@ -203,16 +496,22 @@ class FunctionTool(pydantic.BaseModel):
     async def __call__(self, *args):
         ...
 
-    _models: ClassVar[Dict[str, 'FunctionTool']] = {}
-    _options: ClassVar[List[Tuple[str, Callable[[Any], Any]]]] = []
+    _models: ClassVar[Dict[str, Type['FunctionTool']]] = {}
+    _options: ClassVar[Dict[str, Dict[str, Any]]] = {}
+    _settings: ClassVar[Dict[str, 'ToolSettings']] = {}
 
     @classmethod
-    def __pydantic_init_subclass__(cls, /, *, help, default=False):
+    def __pydantic_init_subclass__(cls, /, *, help, default=False,
+        concurrency: Optional[int] = None, timeout: Optional[float] = None,
+        cache: Optional[float] = None,
+        budget: Optional[int] = None, strategy='paginate'
+    ):
         FunctionTool._models[cls.__name__] = cls
-        flag = click.option(f"--{cls.__name__.replace('_', '-')}",
-            is_flag=True, default=default, help=help
+        FunctionTool._options[cls.__name__] = {'help': help, 'default': default}
+        FunctionTool._settings[cls.__name__] = ToolSettings(
+            semaphore=Semaphore(concurrency) if concurrency else None,
+            timeout=timeout, cache=cache, budget=budget, strategy=strategy
         )
-        FunctionTool._options.append((cls.__name__, flag))
 
     @classmethod
     def function_tool_param(cls) -> FunctionToolParam:
@@ -241,76 +540,202 @@ class FunctionTool(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(frozen=True)
 
 
-async def text_to_speech(speech: AsyncSpeech, text, *,
+async def stream_speech(speech: AsyncSpeech, text, *,
     model: SpeechModel = "tts-1-hd",
     voice="nova", speed=1.0, response_format="mp3",
-    cache_dir="~/.cache/ass/openai/audio/speech",
     semaphore=Semaphore(1)
-) -> Path:
-    text = text.strip()
-    hash = hashlib.sha3_512(text.encode('utf-8')).hexdigest()
-    dir, basename = hash[:3], hash[3:]
-    path = (
-        Path(cache_dir).expanduser() / model / voice / str(speed) /
-        dir / f"{basename}.{response_format}"
-    )
-    if not path.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        async with semaphore:
-            async with speech.with_streaming_response.create(input=text,
-                model=model, voice=voice, speed=speed,
-                response_format=response_format
-            ) as response:
-                await response.stream_to_file(path)
+) -> AsyncIterator[bytes]:
+    """Yield synthesized speech as it arrives, caching it on disk.
 
-    return path
+    Concurrent requests for the same speech share one synthesis.
+    """
 
+    key = _speech_key(text, model=model, voice=voice, speed=speed,
+        response_format=response_format
+    )
+    if (file := speech_cache.lookup(key)) is not None:
+        with file.open('rb') as audio:
+            while chunk := audio.read(1 << 16):
+                yield chunk
+        return
+
+    if (flight := _speech_flights.get(key)) is None:
+        flight = _speech_flights[key] = _Flight()
+        flight.task = create_task(_synthesize(speech, key, flight, semaphore,
+            input=text.strip(), model=model, voice=voice, speed=speed,
+            response_format=response_format
+        ))
+    async for chunk in flight:
+        yield chunk
+
+
+class _Flight:
+    """Chunks of a download shared by all of its readers."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task = None
+        self._changed = Event()
+
+    def add(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self._changed.set()
+        self._changed = Event()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done, self.error = True, error
+        self._changed.set()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+async def _synthesize(speech: AsyncSpeech, key: str, flight: _Flight,
+    semaphore: Semaphore, **params
+) -> None:
+    part = speech_cache.partial(key)
+    try:
+        async with semaphore:
+            async with speech.with_streaming_response.create(**params) as response:
+                with part.open('wb') as file:
+                    async for chunk in response.iter_bytes():
+                        file.write(chunk)
+                        flight.add(chunk)
+        speech_cache.commit(key, part)
+        flight.finish()
+    except BaseException as error:
+        flight.finish(error)
+        if not isinstance(error, Exception):
+            raise
+    finally:
+        part.unlink(missing_ok=True)
+        del _speech_flights[key]
 
-def tools_options(exclude=[]):
-    """Add enablers for all registered tools to a command."""
 
-    def decorator(command):
-        for name, flag in reversed(_internaloptions + FunctionTool._options):
-            if name not in exclude:
-                command = flag(command)
+def _speech_key(text, *,
+    model: SpeechModel = "tts-1-hd",
+    voice="nova", speed=1.0, response_format="mp3", **kwargs
+) -> str:
+    return hashlib.sha256(json.dumps(
+        [model, voice, speed, response_format, text.strip()]
+    ).encode()).hexdigest()
 
-        return command
 
-    return decorator
+_speech_flights: Dict[str, _Flight] = {}
 
 
 class environment:
     def __init__(self, **kwargs):
+        # Identifies state tools keep per environment, like browser sessions.
+        self.session = next(_sessions)
         for key, value in kwargs.items():
             setattr(self, key, value)
 
 
-def load_tools():
-    for spec in (
-        spec_from_file_location('plugin', os.path.join(root, file))
-        for dir in (
-            "/etc/ass/plugins/", os.path.expanduser("~/.config/ass/plugins/")
-        )
-        for root, dirs, files in os.walk(dir)
-        for file in files if file.endswith('.py')
-    ):
-        spec.loader.exec_module(module_from_spec(spec))
+_sessions = count()
 
 
-async def _call(function: Function, *args: Any) -> str:
+async def _call(function: Function, *args: Any,
+    deadline: Optional[float] = None
+) -> str:
     """Call a function tool."""
 
     try:
-        model = FunctionTool._models[function.name]
-        result = await model.model_validate_json(function.arguments)(*args)
+        name = function.name
+        tool = _model(name).model_validate_json(function.arguments)
+        settings = FunctionTool._settings[name]
+        stats = tool_stats.setdefault(name, ToolStats())
+        key = hashlib.sha256(
+            f"{name}\0{tool.model_dump_json()}".encode()
+        ).hexdigest()
+        output = None
+        if settings.cache is not None:
+            if (output := tool_cache.get(key, settings.cache)) is not None:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+        if output is None:
+            result = await _execute(name, tool, args, deadline)
+            output = to_json(result, fallback=str).decode()
+            if settings.cache is not None:
+                tool_cache.put(key, output)
+
+        if settings.budget is not None:
+            # Strategies like diff remember what this environment was shown.
+            session = getattr(args[0], 'session', None) if args else None
+            tokens = budget.estimate_tokens(output)
+            output = budget.apply(settings.strategy, f"{session}:{key}",
+                output, settings.budget
+            )
+            stats.tokens_saved += tokens - budget.estimate_tokens(output)
+
+        return output
+
+    except pydantic.ValidationError as error:
+        return _error("Invalid arguments",
+            details=error.errors(include_url=False, include_context=False,
+                include_input=False
+            )
+        )
+
+    except ToolTimeout as timeout:
+        return _error(str(timeout))
+
+    except Exception as error:
+        return _error(f"{type(error).__name__}: {error}")
+
+
+def _error(message: str, **details) -> str:
+    """Report a failed tool call to the model."""
 
-        if isinstance(result, pydantic.BaseModel):
-            return result.model_dump_json()
+    return to_json({'error': message, **details}, fallback=str).decode()
 
-        return json.dumps(result)
 
-    except BaseException:
-        return traceback.format_exc()
+class ToolTimeout(Exception):
+    """A function tool did not finish in time and was cancelled."""
+
+
+async def _execute(name: str, tool: FunctionTool, args, deadline) -> Any:
+    """Run a tool within its concurrency limit and time budget."""
+
+    settings = FunctionTool._settings[name]
+    stats = tool_stats[name]
+    loop = get_running_loop()
+    start = loop.time()
+    if settings.timeout is not None:
+        deadline = min(start + settings.timeout, deadline or float('inf'))
+    scope = asyncio_timeout_at(deadline)
+    stats.calls += 1
+    try:
+        async with scope:
+            async with settings.semaphore or nullcontext():
+                started = loop.time()
+                stats.queued += started - start
+                try:
+                    return await tool(*args)
+                finally:
+                    stats.running += loop.time() - started
+    except TimeoutError:
+        if not scope.expired():
+            raise
+        stats.timeouts += 1
+        raise ToolTimeout(
+            f"{name} did not finish within "
+            f"{loop.time() - start:.1f} seconds and was cancelled."
+        )
 
 
 def _create_function_tool(
@@ -336,12 +761,26 @@ def _create_function_tool(
     )
 
 
-def _alltools():
-    functiontools = {
-        name: model.function_tool_param()
-        for name, model in FunctionTool._models.items()
+def _model(name: str) -> Type[FunctionTool]:
+    """Look up a function tool, importing its module on first use."""
+
+    if name not in FunctionTool._models:
+        registry.load(registry.manifest()[name]['source'])
+
+    return FunctionTool._models[name]
+
+
+def _tools(names: Iterable[str]) -> Dict[str, AssistantToolParam]:
+    manifest = registry.manifest()
+    tools = {
+        name: (_internaltools[name] if name in _internaltools
+               else manifest[name]['schema'])
+        for name in names
     }
-    return {**_internaltools, **functiontools}
+    if any(manifest.get(name, {}).get('budget') for name in tools):
+        tools['read_more'] = _model('read_more').function_tool_param()
+
+    return tools
 
 
 _internaltools: Dict[str, AssistantToolParam] = {
@@ -349,14 +788,60 @@ _internaltools: Dict[str, AssistantToolParam] = {
     'file_search': FileSearchToolParam(type='file_search')
 }
 
-_internaloptions = [
-    ("code_interpreter",
-     click.option("--code-interpreter", is_flag=True, default=False,
-                  help="""Offer a code_interpreter to the assistant.""")),
-    ("file_search",
-     click.option("--file-search", is_flag=True, default=False,
-                  help="""Add provided files to a vector store."""))
-]
+
+@dataclass(slots=True)
+class ToolSettings:
+    semaphore: Optional[Semaphore] = None
+    timeout: Optional[float] = None
+    cache: Optional[float] = None
+    budget: Optional[int] = None
+    strategy: str = 'paginate'
+
+
+@dataclass(slots=True)
+class ToolStats:
+    calls: int = 0
+    timeouts: int = 0
+    hits: int = 0
+    misses: int = 0
+    tokens_saved: int = 0
+    queued: float = 0.0
+    running: float = 0.0
+
+
+tool_stats: Dict[str, ToolStats] = {}
+
+
+def tool_totals() -> str:
+    """Summarize all tool calls in a few words."""
+
+    totals = ToolStats()
+    for stats in tool_stats.values():
+        totals.calls += stats.calls
+        totals.timeouts += stats.timeouts
+        totals.hits += stats.hits
+        totals.tokens_saved += stats.tokens_saved
+
+    return (
+        f"tools {totals.calls} calls {totals.hits} cached "
+        f"{totals.timeouts} timeouts {totals.tokens_saved} tokens saved"
+    )
+
+
+def tool_summary() -> List[str]:
+    """Describe the calls of every tool used so far, one line each."""
+
+    return [
+        f"{name}: {stats.calls} calls, {stats.timeouts} timeouts, "
+        f"{stats.hits} hits, {stats.misses} misses, "
+        f"{stats.tokens_saved} tokens saved, "
+        f"{stats.queued:.2f}s queued, {stats.running:.2f}s running"
+        for name, stats in sorted(tool_stats.items())
+    ]
+
+
+tool_cache = Cache("~/.cache/ass/tools.sqlite", max_size=64 << 20)
+speech_cache = FileCache("~/.cache/ass/speech", max_size=512 << 20)
 
 
 @dataclass(slots=True)
@@ -368,3 +853,12 @@ class AUsage:
         self.prompt_tokens += other.prompt_tokens
         self.completion_tokens += other.completion_tokens
         return self
+
+
+@function(help="Read further parts of long tool outputs.")
+async def read_more(env, /, *, cursor: str, part: str):
+    """Fetch another part of a tool output which exceeded its size budget.
+    Valid parts are listed along with the cursor.
+    """
+
+    return budget.read(cursor, part)
@@ -1,8 +1,10 @@
 from importlib import resources
+import sys
 
 import click
 
-from ass.oai import tools_options
+from ass import client
+from ass.tools import tools_options
 
 @click.command(help="Command-line generator for Bash")
 @tools_options(exclude=['result', 'shell', 'dialogs'])
@@ -15,10 +17,14 @@ def bash(**spec):
 #
 # And bind the function to a sequence of your liking:
 #
-# bind -x '"\C-xa": ass-ask-bash'""")
+# bind -x '"\C-xa": ass-ask-bash'
+#
+# Run `ass serve` in the background to answer requests without starting
+# a new ass process every time.""")
     print()
     print(f'''ASS_ASK_BASH_INSTRUCTIONS="{_instructions("Bash")}"''')
     print(f'''ASS_ASK_BASH_TOOLS="{_to_args(spec)}"''')
+    print(_client_variables())
     print(resources.read_text(__package__, "bash.sh"))
 
 
@@ -33,10 +39,14 @@ def zsh(**spec):
 #
 # And bind the function to a sequence of your liking:
 #
-# bindkey '^xa' ass-ask-zsh""")
+# bindkey '^xa' ass-ask-zsh
+#
+# Run `ass serve` in the background to answer requests without starting
+# a new ass process every time.""")
     print()
     print(f'''ASS_ASK_ZSH_INSTRUCTIONS="{_instructions("Zsh")}"''')
     print(f'''ASS_ASK_ZSH_TOOLS="{_to_args(spec)}"''')
+    print(_client_variables())
     print(resources.read_text(__package__, "zsh.sh"))
 
 
@@ -50,6 +60,12 @@ The shell command will be inserted into the users readline buffer for review
 and potential submission to an interactive shell."""
 
 
+def _client_variables() -> str:
+    return f'''ASS_SOCKET="${{ASS_SOCKET:-{client.socket_path()}}}"
+ASS_PYTHON="{sys.executable}"
+ASS_CLIENT="{client.__file__}"'''
+
+
 def _to_args(spec: dict) -> str:
     return " ".join(
         f"--{name.replace('_', '-')}"
@@ -5,8 +5,10 @@ import sys
 from click import command, option, argument, pass_obj, File
 
 from ass.oai import (
-    make_assistant, temporary_thread, stream_a_run, tools_options, environment
+    make_assistant, temporary_thread, stream_a_run, coalesce, environment,
+    tool_summary
 )
+from ass.tools import tools_options
 
 
 @command(help="Ask a single question")
@@ -17,6 +19,8 @@ from ass.oai import (
 @option("--model", default="gpt-4o-2024-08-06", show_default=True)
 @option("--message-file", type=File('r'), default='-', show_default=True,
         help="File to read the question from.")
+@option("--stats", is_flag=True,
+        help="Report tool call statistics on stderr when done.")
 @tools_options(exclude=('dialogs', 'shell'))
 @argument("files", nargs=-1, type=File('rb'))
 @pass_obj
@@ -26,22 +30,39 @@ def ask(client, *, files, message_file, **spec):
 
 async def async_ui(client, spec, files, text):
     async with client as client:
-        env = environment(client=client)
-        async with make_assistant(client.openai, files, **spec) as assistant:
-            threads = client.openai.beta.threads
-            async with temporary_thread(threads) as thread:
-                file = sys.stderr if 'result' in spec else sys.stdout
-                eol = False
-                await threads.messages.create(thread_id=thread.id, role='user',
-                    content=text
-                )
-                async for event in stream_a_run(threads.runs,
-                    function_tool_args=[env],
-                    thread_id=thread.id, assistant_id=assistant.id
-                ):
-                    match event:
-                        case str(token):
-                            print(token, end='', file=file, flush=True)
-                            eol = True
-                if eol:
-                    print(file=file)
+        await answer(client, spec, files, text)
+
+
+async def answer(client, spec, files, text):
+    stats = spec.pop('stats', False)
+    try:
+        await _answer(client, spec, files, text)
+    finally:
+        if stats:
+            for line in tool_summary():
+                print(line, file=sys.stderr)
+
+
+async def _answer(client, spec, files, text):
+    env = environment(client=client)
+    async with make_assistant(client.openai, files,
+        progress=lambda text: print(text, file=sys.stderr),
+        **spec
+    ) as assistant:
+        threads = client.openai.beta.threads
+        async with temporary_thread(threads) as thread:
+            file = sys.stderr if 'result' in spec else sys.stdout
+            eol = False
+            await threads.messages.create(thread_id=thread.id, role='user',
+                content=text
+            )
+            async for event in coalesce(stream_a_run(threads.runs,
+                function_tool_args=[env],
+                thread_id=thread.id, assistant_id=assistant.id
+            )):
+                match event:
+                    case str(token):
+                        print(token, end='', file=file, flush=True)
+                        eol = True
+            if eol:
+                print(file=file)
@@ -1,45 +1,270 @@
 """Simple Ffmpeg-based sound I/O layer."""
 
-from asyncio import Semaphore, create_subprocess_exec
-from asyncio.subprocess import DEVNULL
+from asyncio import (CancelledError, Lock, Queue, create_subprocess_exec,
+                     create_task, gather, get_running_loop, shield, sleep,
+                     timeout as asyncio_timeout)
+from asyncio.subprocess import DEVNULL, PIPE
 from contextlib import asynccontextmanager
 from glob import glob
+import hashlib
+import json
+from mmap import ACCESS_READ, mmap
+import os
 from os import mkdir
 from os.path import basename, splitext, expanduser, join, exists
 from pathlib import Path
+from typing import (AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional,
+                    Tuple, Union)
 from uuid import uuid4
 
-from aiofiles.tempfile import TemporaryDirectory, NamedTemporaryFile  # type: ignore
 
+# Memory views hold audio which is already decoded to `pcm`.
+Audio = Union[bytes, memoryview, Path, AsyncIterable[bytes]]
 
-_only_one = Semaphore(1)
+# Everything is decoded to this raw format before it is played.
+pcm = ["-f", "s16le", "-ar", "24000", "-ac", "1"]
+bytes_per_second = 24000 * 2
 
 
-async def play(items: list[bytes | Path]):
-    async with TemporaryDirectory() as dir:
-        files = []
-        for item in items:
-            if isinstance(item, bytes):
-                file = await NamedTemporaryFile(dir=dir, delete=False)
-                await file.write(item)
-                await file.close()
-                files.append(file.name)
-            elif isinstance(item, Path):
-                files.append(str(item.resolve()))
+async def play(items: Iterable[Audio] | AsyncIterable[Audio],
+    output=("-f", "alsa", "default")
+):
+    """Play audio items in order, after anything already playing.
+
+    All items are decoded concurrently, so playback of the first item
+    starts as soon as its first bytes arrived while later items are still
+    being synthesized or downloaded.  Items may also be produced while
+    playing, playback then ends once `items` is exhausted.
+    """
+
+    if (sink := sinks.get(tuple(output))) is None:
+        sink = sinks[tuple(output)] = Sink(output)
+    await sink.play(items)
+
+
+def skip():
+    """Skip the item currently playing."""
+
+    for sink in sinks.values():
+        sink.skip()
+
+
+def stop():
+    """Stop playing and drop everything queued."""
+
+    for sink in sinks.values():
+        sink.stop()
+
+
+class Sink:
+    """A long-lived ffmpeg process playing raw PCM from a pipe.
+
+    Calls to `play` are queued and played gaplessly one after the other.
+    Audio is written at most `lead` seconds ahead of playback, so skipping
+    and stopping take effect quickly.  The process exits after `idle`
+    seconds without audio.
+    """
+
+    def __init__(self, output, *, lead=0.2, idle=30.0):
+        self.output = list(output)
+        self.lead = lead
+        self.idle = idle
+        self._queue: Optional[Queue] = None
+        self._task = None
+        self._process = None
+        self._clock = 0.0
+        self._current: Optional[_Playback] = None
+
+    async def play(self, items) -> None:
+        if self._task is None or self._task.done():
+            self._queue = Queue()
+            self._task = create_task(self._run())
+        playback = _Playback(items)
+        self._queue.put_nowait(playback)
+        try:
+            await shield(playback.done)
+        except CancelledError:
+            playback.close()
+            raise
+
+    def skip(self) -> None:
+        if self._current is not None:
+            self._current.skip()
+
+    def stop(self) -> None:
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._queue.get_nowait().close()
+        if self._current is not None:
+            self._current.close()
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    async with asyncio_timeout(self.idle if self._process else None):
+                        playback = await self._queue.get()
+                except TimeoutError:
+                    await self._close()
+                    continue
+                self._current = playback
+                try:
+                    async for chunk in playback:
+                        await self._write(chunk, playback)
+                except Exception as error:
+                    playback.close(error)
+                finally:
+                    self._current = None
+                    # Callers are released once their audio was played.
+                    loop = get_running_loop()
+                    loop.call_at(max(self._clock, loop.time()), playback.close)
+        finally:
+            await self._close()
+
+    async def _write(self, chunk: bytes, playback: '_Playback') -> None:
+        loop = get_running_loop()
+        if self._process is None or self._process.returncode is not None:
+            self._process = await create_subprocess_exec("ffmpeg",
+                "-loglevel", "error", *pcm, "-i", "pipe:0", *self.output,
+                stdin=PIPE
+            )
+        step = int(bytes_per_second * self.lead) & ~1
+        for start in range(0, len(chunk), step):
+            if playback.interrupted:
+                return
+            piece = chunk[start:start + step]
+            now = loop.time()
+            self._clock = max(self._clock, now) + len(piece) / bytes_per_second
+            self._process.stdin.write(piece)
+            await self._process.stdin.drain()
+            if (ahead := self._clock - now - self.lead) > 0:
+                await sleep(ahead)
+
+    async def _close(self):
+        if self._process is not None:
+            process, self._process = self._process, None
+            process.stdin.close()
+            await process.wait()
+
+
+class _Playback:
+    """Items of one `play` call, decoded concurrently as they come in."""
+
+    def __init__(self, items):
+        self.done = get_running_loop().create_future()
+        self._items: Queue = Queue()
+        self._pumps = [create_task(self._produce(items))]
+        self._queues: List[Queue] = []
+        self._pump = None
+        self._skipped = False
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether the current item was skipped or playback was closed."""
+
+        return self._skipped or self.done.done()
 
-        async with _only_one:
-            await cat(files, "-f", "alsa", "default")
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while (entry := await self._items.get()) is not None:
+            queue, self._pump = entry
+            self._skipped = False
+            while (chunk := await queue.get()) is not None:
+                if self.done.done():
+                    return
+                if self._skipped:
+                    continue
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
 
+    def skip(self) -> None:
+        if self._pump is not None:
+            self._skipped = True
+            self._pump.cancel()
 
-async def cat(files, *output_args):
-    args = ["-loglevel", "error"]
-    args.extend(arg for file in files for arg in ['-i', file])
-    args.extend([
-        "-filter_complex", f"concat=n={len(files)}:v=0:a=1[a]", "-map", "[a]"
-    ])
-    args.extend(output_args)
-    ffmpeg = await create_subprocess_exec("ffmpeg", *args)
-    await ffmpeg.wait()
+    def close(self, error: Optional[Exception] = None) -> None:
+        if self.done.done():
+            return
+        for task in self._pumps:
+            task.cancel()
+        # Tasks cancelled before they started never end their queues.
+        for queue in self._queues:
+            queue.put_nowait(None)
+        self._items.put_nowait(None)
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+
+    async def _produce(self, items):
+        try:
+            if isinstance(items, AsyncIterable):
+                async for item in items:
+                    self._start(item)
+            else:
+                for item in items:
+                    self._start(item)
+        finally:
+            self._items.put_nowait(None)
+
+    def _start(self, item):
+        queue: Queue = Queue()
+        task = create_task(self._decode(item, queue))
+        self._pumps.append(task)
+        self._queues.append(queue)
+        self._items.put_nowait((queue, task))
+
+    @staticmethod
+    async def _decode(item, queue):
+        try:
+            if isinstance(item, memoryview):
+                queue.put_nowait(item)
+                return
+            async for chunk in decode(item):
+                queue.put_nowait(chunk)
+        except Exception as error:
+            queue.put_nowait(error)
+        finally:
+            queue.put_nowait(None)
+
+
+sinks: Dict[Tuple[str, ...], Sink] = {}
+
+
+async def decode(item: Audio) -> AsyncIterator[bytes]:
+    """Decode audio to raw PCM while it arrives."""
+
+    source = str(item.resolve()) if isinstance(item, Path) else "pipe:0"
+    ffmpeg = await create_subprocess_exec("ffmpeg",
+        "-loglevel", "error", "-i", source, *pcm, "pipe:1",
+        stdin=DEVNULL if isinstance(item, Path) else PIPE, stdout=PIPE
+    )
+
+    async def feed():
+        try:
+            if isinstance(item, bytes):
+                ffmpeg.stdin.write(item)
+                await ffmpeg.stdin.drain()
+            else:
+                async for chunk in item:
+                    ffmpeg.stdin.write(chunk)
+                    await ffmpeg.stdin.drain()
+        finally:
+            ffmpeg.stdin.close()
+
+    feeder = None if isinstance(item, Path) else create_task(feed())
+    try:
+        while chunk := await ffmpeg.stdout.read(1 << 16):
+            yield chunk
+        if feeder:
+            await feeder
+        await ffmpeg.wait()
+    finally:
+        if feeder:
+            feeder.cancel()
+        if ffmpeg.returncode is None:
+            ffmpeg.kill()
+        await ffmpeg.wait()
 
 
 async def start_recording(
@@ -64,7 +289,90 @@ async def start_recording(
     return stop_recording
 
 
-icons = {
-    splitext(basename(file))[0]: Path(file)
-    for file in glob('/usr/share/sounds/sound-icons/*.wav')
-}
+class IconBank:
+    """Sound icons, decoded once to PCM and kept in a memory-mapped file.
+
+    Nothing is read before the icons are first needed.  The decoded bank
+    is cached on disk and rebuilt whenever an icon file changes.
+    """
+
+    def __init__(self, pattern='/usr/share/sounds/sound-icons/*.wav',
+        cache_file="~/.cache/ass/sound-icons.pcm"
+    ):
+        self.pattern = pattern
+        self.cache_file = Path(cache_file).expanduser()
+        self._files: Optional[Dict[str, Path]] = None
+        self._index: Optional[Dict[str, Tuple[int, int]]] = None
+        self._map: Optional[mmap] = None
+        self._lock = Lock()
+
+    @property
+    def files(self) -> Dict[str, Path]:
+        if self._files is None:
+            self._files = {
+                splitext(basename(file))[0]: Path(file)
+                for file in sorted(glob(self.pattern))
+            }
+
+        return self._files
+
+    def names(self) -> List[str]:
+        return list(self.files)
+
+    async def get(self, name: str) -> memoryview:
+        """Return the decoded PCM of an icon."""
+
+        if self._index is None:
+            async with self._lock:
+                if self._index is None:
+                    await self._load()
+        start, length = self._index[name]
+
+        return memoryview(self._map)[start:start + length]
+
+    async def _load(self):
+        key = hashlib.sha256(json.dumps([
+            pcm, *((str(file), file.stat().st_mtime_ns, file.stat().st_size)
+                   for file in self.files.values())
+        ]).encode()).hexdigest()
+        index_file = self.cache_file.with_suffix('.json')
+        try:
+            cached = json.loads(index_file.read_text())
+            if cached['key'] != key:
+                raise ValueError(key)
+            index = {name: tuple(span) for name, span in cached['index'].items()}
+            # The index is written last, but the bank may be gone since.
+            size = sum(length for _, length in index.values())
+            if self.cache_file.stat().st_size != size:
+                raise ValueError(size)
+        except (OSError, ValueError, KeyError):
+            index = await self._build(key, index_file)
+        if self.cache_file.stat().st_size:
+            with self.cache_file.open('rb') as file:
+                self._map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        else:
+            self._map = mmap(-1, 1)
+        self._index = index
+
+    async def _build(self, key, index_file) -> Dict[str, Tuple[int, int]]:
+        async def decoded(file):
+            return b''.join([chunk async for chunk in decode(file)])
+
+        clips = await gather(*map(decoded, self.files.values()))
+        index, offset = {}, 0
+        for name, clip in zip(self.files, clips):
+            index[name] = (offset, len(clip))
+            offset += len(clip)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        for path, data in (
+            (self.cache_file, b''.join(clips)),
+            (index_file, json.dumps({'key': key, 'index': index}).encode())
+        ):
+            temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            temporary.write_bytes(data)
+            temporary.replace(path)
+
+        return index
+
+
+sound_icons = IconBank()
@@ -0,0 +1,88 @@
+"""Read streamed text aloud, one sentence at a time."""
+
+from asyncio import Queue, Semaphore, create_task
+import re
+from typing import AsyncIterator, Optional
+
+from ass.oai import stream_speech
+from ass.snd import Audio, play
+
+
+class Speaker:
+    """Synthesize text fed in arbitrary pieces as soon as a sentence is
+    complete.
+
+    Sentences are synthesized concurrently (up to `concurrency` at once)
+    and played gaplessly in order.  Code blocks are skipped.
+    """
+
+    def __init__(self, speech, *,
+        model="tts-1", voice="nova", speed=1.25, concurrency=3,
+        min_length=20
+    ):
+        self.speech = speech
+        self.options = dict(model=model, voice=voice, speed=speed,
+            response_format="mp3", semaphore=Semaphore(concurrency)
+        )
+        self.min_length = min_length
+        self._pending = ''
+        self._fenced = False
+        self._line_start = True
+        self._queue: Optional[Queue] = None
+
+    def feed(self, text: str) -> None:
+        self._pending += text
+        while True:
+            newline = self._pending.find('\n')
+            limit = newline if newline >= 0 else len(self._pending)
+            match = None if self._fenced else _sentence.search(
+                self._pending, self.min_length, limit
+            )
+            if match:
+                end = match.end()
+            elif newline >= 0:
+                end = newline + 1
+            else:
+                break
+            self._piece(self._pending[:end])
+            self._pending = self._pending[end:]
+
+    def end(self) -> None:
+        """Speak what is left and finish the current utterance."""
+
+        self._piece(self._pending)
+        self._pending = ''
+        if self._queue is not None:
+            self._queue.put_nowait(None)
+            self._queue = None
+
+    def _piece(self, text: str) -> None:
+        line_start, self._line_start = self._line_start, text.endswith('\n')
+        if line_start and text.lstrip().startswith('```'):
+            self._fenced = not self._fenced
+            return
+        if self._fenced:
+            return
+        text = _markup.sub('', _link.sub(r'\1', text)).strip()
+        if not any(char.isalnum() for char in text):
+            return
+        if self._queue is None:
+            self._queue = Queue()
+            create_task(play(_items(self._queue))).add_done_callback(_ignore)
+        self._queue.put_nowait(stream_speech(self.speech, text, **self.options))
+
+
+async def _items(queue: Queue) -> AsyncIterator[Audio]:
+    while (item := await queue.get()) is not None:
+        yield item
+
+
+def _ignore(task) -> None:
+    # Speaking is best effort, a failure must not disturb the chat.
+    if not task.cancelled():
+        task.exception()
+
+
+_sentence = re.compile(r'[.!?…:;]["\')\]]*\s')
+_link = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_markup = re.compile(r'[*_`#>|]+')
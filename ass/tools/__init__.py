@@ -0,0 +1,135 @@
+"""Function tool registry.
+
+Command-line flags and JSON schemas for all function tools are kept in a
+manifest which is cached on disk, so tool modules (and plugins) are only
+imported once a tool is actually called.
+"""
+import hashlib
+from importlib import import_module
+from importlib.util import find_spec, module_from_spec, spec_from_file_location
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import click
+
+
+plugin_dirs = ("/etc/ass/plugins/", "~/.config/ass/plugins/")
+cache_file = "~/.cache/ass/tools.json"
+
+
+def tools_options(exclude=[]):
+    """Add enablers for all known tools to a command."""
+
+    def decorator(command):
+        options = [*_internaloptions.items(), *manifest().items()]
+        for name, option in reversed(options):
+            if name not in exclude:
+                command = click.option(f"--{name.replace('_', '-')}",
+                    is_flag=True, default=option['default'],
+                    help=option['help']
+                )(command)
+
+        return command
+
+    return decorator
+
+
+def sources() -> List[str]:
+    """Return the paths of all modules and plugins which may define tools."""
+
+    package = Path(__file__).parent
+    return [
+        *(str(path) for path in sorted(package.glob('*.py'))
+          if path.stem != '__init__'),
+        *(os.path.join(root, file)
+          for dir in plugin_dirs
+          for root, dirs, files in os.walk(os.path.expanduser(dir))
+          for file in sorted(files) if file.endswith('.py'))
+    ]
+
+
+def load(source: str) -> None:
+    """Import a tool module or execute a plugin."""
+
+    if source in _loaded:
+        return
+    path = Path(source)
+    if path.parent == Path(__file__).parent:
+        import_module(f"{__name__}.{path.stem}")
+    else:
+        spec = spec_from_file_location('plugin', source)
+        spec.loader.exec_module(module_from_spec(spec))
+    _loaded.add(source)
+
+
+def manifest() -> Dict[str, Dict[str, Any]]:
+    """Map tool names to their source, help text, default state and schema."""
+
+    global _manifest
+    if _manifest is None:
+        paths = sources()
+        key = _fingerprint(paths)
+        cache = Path(cache_file).expanduser()
+        try:
+            cached = json.loads(cache.read_text())
+            if cached['key'] == key:
+                _manifest = cached['tools']
+        except (OSError, ValueError, KeyError):
+            pass
+        if _manifest is None:
+            _manifest = _scan(paths)
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(json.dumps({'key': key, 'tools': _manifest}))
+
+    return _manifest
+
+
+def _scan(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+    from ass.oai import FunctionTool
+
+    tools = {}
+    for source in paths:
+        known = set(FunctionTool._options)
+        load(source)
+        tools.update({
+            name: {
+                'source': source, **option,
+                'schema': FunctionTool._models[name].function_tool_param(),
+                'budget': FunctionTool._settings[name].budget
+            }
+            for name, option in FunctionTool._options.items()
+            if name not in known
+        })
+
+    return tools
+
+
+def _fingerprint(paths: List[str]) -> str:
+    # Schemas also depend on the installed pydantic and on ass.oai.
+    pydantic = os.stat(find_spec('pydantic').origin)
+    hash = hashlib.sha256(
+        f"{_version}\0{pydantic.st_mtime_ns}\0".encode()
+    )
+    for path in [str(Path(__file__).parent.parent / 'oai.py'), *paths]:
+        hash.update(f"{path}\0".encode())
+        hash.update(Path(path).read_bytes())
+
+    return hash.hexdigest()
+
+
+_version = 3
+_loaded: set = set()
+_manifest: Optional[Dict[str, Dict[str, Any]]] = None
+
+_internaloptions = {
+    'code_interpreter': {
+        'help': """Offer a code_interpreter to the assistant.""",
+        'default': False
+    },
+    'file_search': {
+        'help': """Add provided files to a vector store.""",
+        'default': False
+    }
+}
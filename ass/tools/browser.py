@@ -1,8 +1,18 @@
 from abc import abstractmethod
-from base64 import b64encode
-from typing import List, Literal, Optional, Union
+from asyncio import to_thread
+from collections import OrderedDict
+import hashlib
+from io import BytesIO
+import json
+import re
+from typing import Dict, Iterator, List, Literal, Optional, Tuple, Union
 from typing_extensions import Annotated
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
 
+from bs4 import BeautifulSoup
+import httpx
+from markdownify import markdownify # type: ignore
 from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 
 from ass.oai import function
@@ -20,9 +30,70 @@ class goto(PageAction):
     """Go to the given URL."""
     type: Literal['goto']
     url: HttpUrl
+    lite: bool = Field(False,
+        description="Only the text of the page is needed.  "
+        "Static pages are fetched without rendering and their main text "
+        "is returned, further actions on such a page are not possible."
+    )
 
     async def __call__(self, page):
-        await getattr(page, self.type)(str(self.url))
+        url = str(self.url)
+        if not self.lite:
+            await getattr(page, self.type)(url)
+            return
+
+        host = urlsplit(url).hostname
+
+        async def block(route):
+            request = route.request
+            if request.resource_type in _heavy or (
+                request.resource_type == 'script'
+                and urlsplit(request.url).hostname != host
+            ):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await page.route('**/*', block)
+        try:
+            await getattr(page, self.type)(url)
+        finally:
+            await page.unroute('**/*', block)
+        # Some pages only render with all their resources.
+        if not (await page.inner_text('body')).strip():
+            await getattr(page, self.type)(url)
+
+
+_heavy = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+
+async def readable(http: httpx.AsyncClient, url: str) -> Optional[dict]:
+    """Fetch a static page without a browser and extract its main text."""
+
+    try:
+        response = await http.get(url, follow_redirects=True)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    if 'html' not in response.headers.get('content-type', ''):
+        return None
+    soup = BeautifulSoup(response.text, features='html.parser')
+    title = soup.title.get_text().strip() if soup.title else None
+    for tag in soup(['script', 'style', 'noscript', 'template', 'svg',
+        'iframe', 'form', 'nav', 'header', 'footer', 'aside'
+    ]):
+        tag.decompose()
+    main = soup.find('article') or soup.find('main') or soup.body
+    if main is None:
+        return None
+    text = markdownify(main.decode_contents()).strip()
+    if not text:
+        return None
+
+    return {
+        'url': str(response.url), 'title': title,
+        'text': re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    }
 
 
 class go_back(PageAction):
@@ -38,22 +109,75 @@ class accessibility(PageAction):
     type: Literal['accessibility']
 
     async def __call__(self, page):
-        return await getattr(page, self.type).snapshot()
+        return await snapshot(page, full=True)
+
 
+def walk(tree: Optional[dict]) -> Iterator[Tuple[str, dict]]:
+    """Yield all nodes of an accessibility tree in document order.
+    Each node is paired with a path of roles and names which identifies it
+    across snapshots.
+    """
 
-def get_selectors(node: dict, selectors=[]):
-    if 'role' in node and 'name' in node:
-        role = node['role']
-        name = node['name']
-        if name and name not in ('heading', 'text leaf'):
-            selectors.append(f'role={role}[name="{name}"]')
-    if 'children' in node:
-        for child in node['children']:
-            get_selectors(child, selectors)
+    stack = [('', tree)] if tree else []
+    while stack:
+        path, node = stack.pop()
+        yield path, node
+        children = node.get('children', ())
+        seen: Dict[str, int] = {}
+        paths = []
+        for child in children:
+            step = f"{child.get('role', '')}:{child.get('name', '')}"
+            seen[step] = seen.get(step, 0) + 1
+            if seen[step] > 1:
+                step = f"{step}#{seen[step]}"
+            paths.append(f"{path}/{step}")
+        stack.extend(zip(reversed(paths), reversed(children)))
+
+
+def get_selectors(tree: Optional[dict]) -> List[str]:
+    selectors = []
+    for _, node in walk(tree):
+        name = node.get('name')
+        if 'role' in node and name and name not in ('heading', 'text leaf'):
+            selectors.append(f'role={node["role"]}[name="{name}"]')
 
     return selectors
 
 
+async def snapshot(page, *, full: bool = False):
+    """Snapshot the accessibility tree of a page.
+    Unless a full snapshot is requested or the page was navigated, only
+    the differences to the previous snapshot of the same page are returned.
+    """
+
+    tree = await page.accessibility.snapshot()
+    nodes = {
+        path: {key: value for key, value in node.items() if key != 'children'}
+        for path, node in walk(tree)
+    }
+    previous = _snapshots.get(page)
+    _snapshots[page] = (page.url, nodes)
+    if full or previous is None or previous[0] != page.url:
+        return tree
+    before = previous[1]
+    changes = {
+        'added': {path: node for path, node in nodes.items()
+                  if path not in before},
+        'removed': [path for path in before if path not in nodes],
+        'changed': {path: node for path, node in nodes.items()
+                    if path in before and before[path] != node}
+    }
+    changes = {key: value for key, value in changes.items() if value}
+    if not changes:
+        return {'unchanged': True}
+    # Report large changes as a fresh snapshot, which is easier to read.
+    updated = len(changes.get('added', ())) + len(changes.get('changed', ()))
+    if updated > len(nodes) // 2:
+        return tree
+
+    return {'diff': changes}
+
+
 class list_selectors(PageAction):
     """Return a list of possible selectors for interaction with page elements."""
     type: Literal['list_selectors']
@@ -157,18 +281,30 @@ class screenshot(PageAction):
                 if self.mask else None
             )
         )
+        # Identical screenshots of the same page reuse their description.
+        key = hashlib.sha256(json.dumps(
+            [page.url, self.model_dump(mode='json', exclude={'mask'})]
+        ).encode() + png).hexdigest()
 
         async def describe(completions):
+            if key in _descriptions:
+                _descriptions.move_to_end(key)
+                return _descriptions[key]
+            images = await to_thread(prepare, png)
             response = await completions.create(
                 model=self.model,
                 max_tokens=self.max_tokens, n=self.n,
                 temperature=self.temperature,
                 messages=[
                     {'role': 'system', 'content': self.instructions},
-                    {'role': 'user', 'content': [image_url(png)]}
+                    {'role': 'user', 'content': images}
                 ]
             )
-            return [choice.message.content for choice in response.choices]
+            result = [choice.message.content for choice in response.choices]
+            _descriptions[key] = result
+            while len(_descriptions) > 32:
+                _descriptions.popitem(last=False)
+            return result
 
         return describe
 
@@ -185,44 +321,58 @@ Action = Annotated[
 Browser = Literal['chromium', 'firefox', 'webkit']
 
 
-@function(help="Allow access to a headless graphical browser.")
+@function(help="Allow access to a headless graphical browser.",
+    concurrency=4, timeout=120, budget=4000
+)
 async def browser(env, /, *, browser: Browser = "firefox", action: Action):
     """Interact with a browser.
     If the action does not return a result (like goto and go_back),
-    a snapshot of the accessibility tree is returned.
+    a snapshot of the accessibility tree is returned.  While staying on
+    the same URL, only changes to the previous snapshot are reported.
+    A lite goto returns the text of static pages instead.
     For further details, request a screenshot which is going to be
     described by a vision model according to your instructions.
     """
 
-    page = await get_page(env.client.playwright, browser)
-    if result := await action(page):
-        if callable(result):
-            result = await result(env.client.openai.chat.completions)
-        return result
-    return await page.accessibility.snapshot()
+    if isinstance(action, goto) and action.lite:
+        if text := await readable(env.client.http, str(action.url)):
+            return text
+    pool = await env.client.browsers()
+    async with pool.page(browser, env.session) as page:
+        result = await action(page)
+        if not result:
+            return await snapshot(page)
+    if callable(result):
+        result = await result(env.client.openai.chat.completions)
+    return result
 
 
-_browser = {}
-_context = {}
-_page = {}
+_snapshots: 'WeakKeyDictionary[object, Tuple[str, Dict[str, dict]]]' = WeakKeyDictionary()
 
 
-async def get_page(playwright, browser: str):
-    global _browser, _context, _page
-    if browser not in _page:
-        if browser not in _context:
-            if browser not in _browser:
-                _browser[browser] = await getattr(playwright, browser).launch(headless=True)
-            _context[browser] = await _browser[browser].new_context()
-        _page[browser] = await _context[browser].new_page()
-    return _page[browser]
+_descriptions: 'OrderedDict[str, List[str]]' = OrderedDict()
 
 
-def image_url(png):
-    return {
-        'type': 'image_url',
-        'image_url': {
-            'url': f"data:image/png;base64,{b64encode(png).decode()}",
-            'detail': 'high'
-        }
-    }
+def prepare(png: bytes):
+    """Encode a screenshot as compact image parts.
+    Full page captures are split into tiles, each clipped like in vision.
+    """
+
+    from PIL import Image
+    from ass.vision import clip, data_url, tiles
+
+    image = Image.open(BytesIO(png)).convert('RGB')
+
+    # Flat interfaces compress better losslessly, photos do not.
+    return [
+        image_url(min(
+            data_url(tile, "WEBP", quality=80),
+            data_url(tile, "PNG", optimize=True),
+            key=len
+        ))
+        for tile in (clip(tile, 2000, 768) for tile in tiles(image, 2000, 768))
+    ]
+
+
+def image_url(url):
+    return {'type': 'image_url', 'image_url': {'url': url, 'detail': 'high'}}
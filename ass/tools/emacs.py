@@ -1,10 +1,12 @@
-from asyncio import create_subprocess_exec
+from asyncio import CancelledError, create_subprocess_exec
 from asyncio.subprocess import DEVNULL, PIPE
 
 from ass.oai import function
 
 
-@function(help="""Allow the model to evaluate Emacs Lisp expressions (unsandboxed).""")
+@function(help="""Allow the model to evaluate Emacs Lisp expressions (unsandboxed).""",
+    timeout=30
+)
 async def emacs_eval(env, /, *, expr: str):
     """Evaluate an Emacs Lisp expression in the currently running Emacs instance."""
 
@@ -15,7 +17,11 @@ async def eval(expr: str) -> str:
     emacsclient = await create_subprocess_exec('emacsclient', '--eval', expr,
         stdin=DEVNULL, stdout=PIPE, stderr=PIPE
     )
-    output, error = await emacsclient.communicate()
+    try:
+        output, error = await emacsclient.communicate()
+    except CancelledError:
+        emacsclient.kill()
+        raise
     if emacsclient.returncode:
         raise RuntimeError(
             f"EmacsClient Error ({emacsclient.returncode}): {error.decode().strip()}"
@@ -1,4 +1,4 @@
-from asyncio import create_subprocess_exec
+from asyncio import CancelledError, create_subprocess_exec
 from asyncio.subprocess import PIPE
 
 from pydantic import HttpUrl
@@ -6,7 +6,9 @@ from pydantic import HttpUrl
 from ass.oai import function
 
 
-@function(help="Allow the model to fetch images and run local OCR on them.")
+@function(help="Allow the model to fetch images and run local OCR on them.",
+    timeout=120, cache=24 * 60 * 60, budget=4000, strategy='truncate'
+)
 async def ocr(env, /, *, url: HttpUrl):
     """Downloads an image and performs OCR on it, returning a string."""
 
@@ -19,7 +21,11 @@ async def tesseract(source: bytes) -> str:
     tesseract = await create_subprocess_exec('tesseract', 'stdin', 'stdout',
         stdin=PIPE, stdout=PIPE, stderr=PIPE
     )
-    output, error = await tesseract.communicate(input=source)
+    try:
+        output, error = await tesseract.communicate(input=source)
+    except CancelledError:
+        tesseract.kill()
+        raise
     if tesseract.returncode:
         raise RuntimeError(
             f"Tesseract-OCR Error ({tesseract.returncode}): {error.decode().strip()}"
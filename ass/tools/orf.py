@@ -10,7 +10,9 @@ from markdownify import markdownify # type: ignore
 from ass.oai import function
 
 
-@function(help="Enable fetching news from ORF.")
+@function(help="Enable fetching news from ORF.", cache=15 * 60,
+    budget=4000
+)
 async def orf_news(env):
     """Fetch current local news from ORF."""
 
@@ -12,7 +12,7 @@ Location = Annotated[str,
     )
 ]
 
-@function(help="Give the model access to OpenWeatherMap.")
+@function(help="Give the model access to OpenWeatherMap.", cache=10 * 60)
 async def weather(env, /, *, location: Location):
     """Retrieve current weather for a particular location."""
 
@@ -1,7 +1,7 @@
 """Basic tmux access."""
 
 from abc import abstractmethod
-from asyncio import create_subprocess_exec
+from asyncio import CancelledError, create_subprocess_exec
 from asyncio.subprocess import PIPE
 from typing import Generic, Iterable, Literal, Optional, TypeVar
 
@@ -57,14 +57,20 @@ TmuxCommand = ( capture_pane
               )
 
 
-@function(help="Allow access to tmux.")
+@function(help="Allow access to tmux.", timeout=10,
+    budget=2000, strategy='diff'
+)
 async def tmux(env, /, *, command: TmuxCommand):
     """Call a tmux subcommand."""
 
     tmux = await create_subprocess_exec('tmux', command.name, *command.args(),
         stdout=PIPE, stderr=PIPE
     )
-    output, error = await tmux.communicate()
+    try:
+        output, error = await tmux.communicate()
+    except CancelledError:
+        tmux.kill()
+        raise
     return {
         'returncode': tmux.returncode,
         **({'output': output.decode()} if output else {}),
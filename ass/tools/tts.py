@@ -1,11 +1,11 @@
-from asyncio import gather, Semaphore
+from asyncio import Semaphore, gather
 from typing import List, Literal
 from typing_extensions import Annotated
 
 from pydantic import BaseModel, Field
 
-from ass.oai import text_to_speech
-from ass.snd import play, icons
+from ass.oai import stream_speech
+from ass.snd import play, sound_icons
 from ass.oai import function
 
 
@@ -15,7 +15,7 @@ class Text(BaseModel):
     text: str = Field(min_length=1, max_length=4096)
 
 
-IconName = Literal[*sorted(icons.keys())] # type: ignore
+IconName = Literal[*sound_icons.names()] # type: ignore
 
 
 class SoundIcon(BaseModel):
@@ -37,16 +37,16 @@ async def tts(env, /, *, clips: Clips):
     """
 
     limit = Semaphore(7)
-    async def get_path(segment):
+    async def audio(segment):
         if isinstance(segment, Text):
-            return await text_to_speech(env.client.openai.audio.speech,
+            return stream_speech(env.client.openai.audio.speech,
                 text=segment.text, model="tts-1", voice=segment.voice,
                 speed=segment.speed, response_format="mp3",
                 semaphore=limit
             )
         else:
-            return icons[segment.sound]
+            return await sound_icons.get(segment.sound)
 
-    await play(await gather(*map(get_path, clips)))
+    await play(await gather(*map(audio, clips)))
 
     return f"Played {len(clips)} audio segments"
@@ -8,7 +8,9 @@ Lang = Literal['de', 'en', 'es', 'fr', 'it', 'nl', 'no', 'pt', 'ro']
 
 export = '{http://www.mediawiki.org/xml/export-0.11/}'
 
-@function(help="""Allow access to wikipedia.""")
+@function(help="""Allow access to wikipedia.""", cache=24 * 60 * 60,
+    budget=4000, strategy='sections'
+)
 async def wikipedia(env, /, *, lang: Lang = 'en', page: str):
     """Fetch a wikipedia article (in Wikimedia format) by page name."""
 
@@ -48,7 +48,7 @@ SMT_LIB = Annotated[str,
 ]
 
 
-@function(help="Offer Z3 to the model.")
+@function(help="Offer Z3 to the model.", cache=30 * 24 * 60 * 60)
 async def smt(env, /, *, smtlib: SMT_LIB):
     """Add SMT-LIB format assertions to a Z3 solver
     and return the model as an S-expression.
@@ -0,0 +1,298 @@
+"""Append-only transcript control for streamed output."""
+
+from bisect import bisect_left, insort
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from prompt_toolkit.completion import CompleteEvent, Completer, Completion
+from prompt_toolkit.data_structures import Point
+from prompt_toolkit.document import Document
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout.controls import UIContent, UIControl
+from prompt_toolkit.layout.utils import explode_text_fragments
+from prompt_toolkit.mouse_events import MouseEvent, MouseEventType
+from prompt_toolkit.styles.pygments import pygments_token_to_classname
+from pygments.lexers.markup import MarkdownLexer
+
+
+class WordIndex:
+    """Incrementally maintained set of words with counts.
+
+    Words are kept sorted, so finding all words with a given prefix only
+    needs a binary search.  Completions are ranked by frequency and then
+    by how recently a word was seen.
+    """
+
+    def __init__(self):
+        self.words: List[str] = []
+        self.counts: Dict[str, int] = {}
+        self.seen: Dict[str, int] = {}
+        self._partial = ''
+        self._serial = 0
+
+    def feed(self, text: str) -> None:
+        text = self._partial + text
+        words = re.findall(r'\S+', text)
+        self._partial = words.pop() if words and not text[-1].isspace() else ''
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        if word not in self.counts:
+            insort(self.words, word)
+            self.counts[word] = 0
+        self.counts[word] += 1
+        self._serial += 1
+        self.seen[word] = self._serial
+
+    def prefixed(self, prefix: str) -> Iterator[str]:
+        index = bisect_left(self.words, prefix)
+        while index < len(self.words) and self.words[index].startswith(prefix):
+            yield self.words[index]
+            index += 1
+
+    def complete(self, prefix: str) -> List[str]:
+        words = set(self.prefixed(prefix))
+        if self._partial.startswith(prefix):
+            words.add(self._partial)
+        words.discard(prefix)
+
+        return sorted(words, key=lambda word: (
+            -self.counts.get(word, 0), -self.seen.get(word, self._serial + 1)
+        ))
+
+
+class WordIndexCompleter(Completer):
+    """Complete the WORD before the cursor from a WordIndex."""
+
+    def __init__(self, index: WordIndex):
+        self.index = index
+
+    def get_completions(self, document: Document,
+        complete_event: CompleteEvent
+    ) -> Iterable[Completion]:
+        prefix = document.get_word_before_cursor(WORD=True)
+        if prefix:
+            for word in self.index.complete(prefix):
+                yield Completion(word, start_position=-len(prefix))
+
+
+class Transcript(UIControl):
+    """A read-only text control which can only grow at the end.
+
+    Text is stored as a list of lines, so the cost of appending does not
+    depend on the length of the transcript.  Lexing restarts at the last
+    blank line outside of a code fence, everything before it is cached.
+
+    The cursor moves with the arrow keys and the common Emacs bindings,
+    up and down move by display line.  C-space sets the mark, M-w copies
+    the selection to the clipboard.
+    """
+
+    def __init__(self, lexer_class=MarkdownLexer):
+        self.lines: List[str] = ['']
+        self.words = WordIndex()
+        self.cursor = Point(x=0, y=0)
+        self.mark: Optional[Point] = None
+        self._lexer = lexer_class(stripnl=False)
+        self._fragments: List[StyleAndTextTuples] = []
+        self._sync = 0
+        self._fenced = False
+        self._key_bindings = self._create_key_bindings()
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+    @property
+    def end(self) -> Point:
+        return Point(x=len(self.lines[-1]), y=len(self.lines) - 1)
+
+    def append(self, text: str) -> None:
+        self.words.feed(text)
+        del self._fragments[self._sync:]
+        first, *rest = text.split('\n')
+        self.lines[-1] += first
+        for line in rest:
+            self._completed(len(self.lines) - 1)
+            self.lines.append(line)
+
+    def _completed(self, index: int) -> None:
+        line = self.lines[index]
+        if line.startswith('```'):
+            self._fenced = not self._fenced
+        elif not self._fenced and not line.strip():
+            self._sync = index + 1
+
+    def _lex(self, start: int) -> List[StyleAndTextTuples]:
+        fragments: List[StyleAndTextTuples] = [[]]
+        text = '\n'.join(self.lines[start:])
+        for token, value in self._lexer.get_tokens(text):
+            style = f"class:{pygments_token_to_classname(token)}"
+            for n, part in enumerate(value.split('\n')):
+                if n:
+                    fragments.append([])
+                if part:
+                    fragments[-1].append((style, part))
+
+        return fragments[:len(self.lines) - start]
+
+    def is_focusable(self) -> bool:
+        return True
+
+    def create_content(self, width: int, height: int) -> UIContent:
+        def get_line(index: int) -> StyleAndTextTuples:
+            if index >= len(self._fragments):
+                self._fragments.extend(self._lex(len(self._fragments)))
+            if self.mark is None:
+                return self._fragments[index]
+            start, end = sorted([self.mark, self.cursor],
+                key=lambda point: (point.y, point.x)
+            )
+            if not start.y <= index <= end.y:
+                return self._fragments[index]
+            line = explode_text_fragments(self._fragments[index])
+            first = start.x if index == start.y else 0
+            last = end.x if index == end.y else len(line)
+
+            return [
+                (f"{style} class:selected" if first <= n < last else style, char)
+                for n, (style, char, *_) in enumerate(line)
+            ]
+
+        return UIContent(get_line=get_line, line_count=len(self.lines),
+            cursor_position=self.cursor, show_cursor=True
+        )
+
+    def move_cursor(self, x: int, y: int) -> None:
+        y = max(0, min(y, len(self.lines) - 1))
+        self.cursor = Point(x=max(0, min(x, len(self.lines[y]))), y=y)
+
+    def selection(self) -> str:
+        """Return the text between the mark and the cursor."""
+
+        if self.mark is None:
+            return ''
+        start, end = sorted([self.mark, self.cursor],
+            key=lambda point: (point.y, point.x)
+        )
+        lines = self.lines[start.y:end.y + 1]
+        lines[-1] = lines[-1][:end.x]
+        lines[0] = lines[0][start.x:]
+
+        return '\n'.join(lines)
+
+    def move_display_line(self, count: int, width: int) -> None:
+        """Move the cursor by `count` lines as displayed with wrapping."""
+
+        x, y = self.cursor
+        width = max(width, 1)
+        for _ in range(abs(count)):
+            if count > 0:
+                if x // width < len(self.lines[y]) // width:
+                    x = min(x + width, len(self.lines[y]))
+                elif y < len(self.lines) - 1:
+                    x, y = x % width, y + 1
+            elif x >= width:
+                x -= width
+            elif y > 0:
+                y -= 1
+                x = min(len(self.lines[y]) // width * width + x, len(self.lines[y]))
+        self.move_cursor(x, y)
+
+    def move_word(self, forward: bool) -> None:
+        """Move the cursor to the end of this or the next word, or to the
+        start of this or the previous one."""
+
+        x, y = self.cursor
+        if forward:
+            while y < len(self.lines):
+                if match := _word.search(self.lines[y], x):
+                    return self.move_cursor(match.end(), y)
+                x, y = 0, y + 1
+            self.move_cursor(*self.end)
+        else:
+            while y >= 0:
+                starts = [m.start() for m in _word.finditer(self.lines[y][:x])]
+                if starts:
+                    return self.move_cursor(starts[-1], y)
+                y -= 1
+                x = len(self.lines[y]) if y >= 0 else 0
+            self.move_cursor(0, 0)
+
+    def mouse_handler(self, mouse_event: MouseEvent):
+        if mouse_event.event_type == MouseEventType.MOUSE_UP:
+            self.move_cursor(mouse_event.position.x, mouse_event.position.y)
+            return None
+
+        return NotImplemented
+
+    def get_key_bindings(self) -> KeyBindings:
+        return self._key_bindings
+
+    def _create_key_bindings(self) -> KeyBindings:
+        kb = KeyBindings()
+
+        def page(event) -> int:
+            info = event.app.layout.current_window.render_info
+            return info.window_height if info else 1
+
+        def width(event) -> int:
+            info = event.app.layout.current_window.render_info
+            return info.window_width if info else 80
+
+        @kb.add('left')
+        @kb.add('c-b')
+        def _(event):
+            x, y = self.cursor
+            if x == 0 and y > 0:
+                self.move_cursor(len(self.lines[y - 1]), y - 1)
+            else:
+                self.move_cursor(x - 1, y)
+
+        @kb.add('right')
+        @kb.add('c-f')
+        def _(event):
+            x, y = self.cursor
+            if x == len(self.lines[y]) and y < len(self.lines) - 1:
+                self.move_cursor(0, y + 1)
+            else:
+                self.move_cursor(x + 1, y)
+
+        @kb.add('c-space')
+        def _(event):
+            self.mark = self.cursor
+
+        @kb.add('escape', 'w')
+        def _(event):
+            event.app.clipboard.set_text(self.selection())
+            self.mark = None
+
+        kb.add('c-g')(lambda event: setattr(self, 'mark', None))
+
+        for keys in [['up'], ['c-p']]:
+            kb.add(*keys)(lambda event: self.move_display_line(-1, width(event)))
+        for keys in [['down'], ['c-n']]:
+            kb.add(*keys)(lambda event: self.move_display_line(1, width(event)))
+        for keys in [['pageup'], ['escape', 'v']]:
+            kb.add(*keys)(lambda event: self.move_cursor(self.cursor.x, self.cursor.y - page(event)))
+        for keys in [['pagedown'], ['c-v']]:
+            kb.add(*keys)(lambda event: self.move_cursor(self.cursor.x, self.cursor.y + page(event)))
+        for keys in [['home'], ['c-a']]:
+            kb.add(*keys)(lambda event: self.move_cursor(0, self.cursor.y))
+        for keys in [['end'], ['c-e']]:
+            kb.add(*keys)(lambda event: self.move_cursor(len(self.lines[self.cursor.y]), self.cursor.y))
+        for keys in [['c-home'], ['escape', '<']]:
+            kb.add(*keys)(lambda event: self.move_cursor(0, 0))
+        for keys in [['c-end'], ['escape', '>']]:
+            kb.add(*keys)(lambda event: self.move_cursor(*self.end))
+        for keys in [['c-right'], ['escape', 'f']]:
+            kb.add(*keys)(lambda event: self.move_word(True))
+        for keys in [['c-left'], ['escape', 'b']]:
+            kb.add(*keys)(lambda event: self.move_word(False))
+
+        return kb
+
+
+_word = re.compile(r'\w+')
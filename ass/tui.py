@@ -1,7 +1,7 @@
 from asyncio import create_task, run
 from dataclasses import dataclass, field
 from functools import partial
-import re
+import sys
 from typing import Optional
 from click import command, option, argument, pass_obj, File
 from openai import AsyncOpenAI
@@ -9,8 +9,6 @@ from openai.types.beta.threads import Run
 from prompt_toolkit.application import Application
 from prompt_toolkit.application.current import get_app
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.completion import WordCompleter
-from prompt_toolkit.document import Document
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.key_binding.bindings.focus import focus_next
 from prompt_toolkit.layout.containers import (
@@ -18,52 +16,54 @@ from prompt_toolkit.layout.containers import (
 )
 from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.layout.menus import CompletionsMenu
-from prompt_toolkit.lexers import PygmentsLexer
 from prompt_toolkit.styles import Style
 from prompt_toolkit.widgets import (
     SearchToolbar, TextArea
 )
-from pygments.lexers.markup import MarkdownLexer
 
-from ass.oai import make_assistant, temporary_thread, stream_a_run, AUsage, tools_options, environment
+from ass.oai import make_assistant, temporary_thread, stream_a_run, coalesce, AUsage, environment, tool_totals
+from ass.tools import tools_options
 from ass.ptutils import show_dialog
-from ass.snd import start_recording
+from ass.snd import skip, start_recording, stop
+from ass.speaker import Speaker
+from ass.transcript import Transcript, WordIndexCompleter
 
 @command(help="Interactively chat with an assistant")
 @option("--instructions", show_default=True, default="You are a helpful assistant.  Never explain acronyms the user uses if not explicitly asked to do so.  Never apologize if the user points out one of your errors.")
 @option("--model", default="o3-mini", show_default=True)
+@option("--speak", is_flag=True,
+    help="Read replies aloud, sentence by sentence."
+)
 @tools_options(exclude=['result'])
 @argument("files", nargs=-1, type=File('rb'))
 @pass_obj
-def chat(client, *, files, **spec):
-    run(async_ui(client, spec, files, tui))
+def chat(client, *, files, speak, **spec):
+    run(async_ui(client, spec, files, partial(tui, speak=speak)))
 
 
 async def async_ui(client, spec, files, ui):
     async with client as client:
-        async with make_assistant(client.openai, files, **spec) as assistant:
+        async with make_assistant(client.openai, files,
+            progress=lambda text: print(text, file=sys.stderr),
+            **spec
+        ) as assistant:
             async with temporary_thread(client.openai.beta.threads) as thread:
                 await ui(client, thread, assistant)
 
-async def tui(client, thread, assistant):
+async def tui(client, thread, assistant, speak=False):
     state = State()
+    speaker = Speaker(client.openai.audio.speech) if speak else None
     search_field = SearchToolbar()
 
-    output_field = TextArea(
-        style="class:output-field",
-        text="",
-        read_only=True,
-        wrap_lines=True,
-        lexer=PygmentsLexer(MarkdownLexer)
+    transcript = Transcript()
+    output_field = Window(transcript, style="class:output-field",
+        wrap_lines=True
     )
 
-    def words():
-        return set(re.findall(r'\S+', output_field.text))
-
     input_field = TextArea(
         height=1,
         prompt="> ",
-        completer=WordCompleter(words),
+        completer=WordIndexCompleter(transcript.words),
         auto_suggest=AutoSuggestFromHistory(),
         style="class:input-field",
         multiline=False,
@@ -79,6 +79,8 @@ async def tui(client, thread, assistant):
         ]
     def status_text_right():
         return [
+            ('', '---'),
+            ('class:tools', tool_totals()),
             ('', '---'),
             ('class:tokens', f"{state.usage.prompt_tokens}|{state.usage.completion_tokens}"),
             ('', "---"),
@@ -110,11 +112,13 @@ async def tui(client, thread, assistant):
         show_dialog=partial(show_dialog, container),
         client=client
     )
-    display = partial(add_text, output_field)
+    display = partial(add_text, transcript)
     def accept(buffer):
         if buffer.text:
             create_task(
-                txrx(client.openai, thread, buffer.text, assistant, display, state, env)
+                txrx(client.openai, thread, buffer.text, assistant, display, state, env,
+                    speaker
+                )
             )
 
     input_field.accept_handler = accept
@@ -129,7 +133,9 @@ async def tui(client, thread, assistant):
                     text = await client.openai.audio.transcriptions.create(
                         file=mp3, model='whisper-1', response_format='text'
                     )
-                    await txrx(client.openai, thread, text.strip(), assistant, display, state, env)
+                    await txrx(client.openai, thread, text.strip(), assistant, display, state, env,
+                        speaker
+                    )
             else:
                 stop_recording = await start_recording()
 
@@ -141,6 +147,8 @@ async def tui(client, thread, assistant):
     kb.add("c-x", "o")(focus_next)
     kb.add("c-x", "c-c")(lambda event: event.app.exit())
     kb.add("c-x", "c-r")(trigger_record)
+    kb.add("c-x", "s")(lambda event: skip())
+    kb.add("c-x", "k")(lambda event: stop())
 
     style = Style([
         ("output-field", "bg:#000000 #ffffff"),
@@ -154,37 +162,52 @@ async def tui(client, thread, assistant):
         style=style,
         mouse_support=True,
         full_screen=True,
+        min_redraw_interval=1 / 30,
     ).run_async()
 
 
-async def txrx(openai: AsyncOpenAI, thread, text, assistant, display, state, env):
+async def txrx(openai: AsyncOpenAI, thread, text, assistant, display, state, env,
+    speaker: Optional[Speaker] = None
+):
     threads = openai.beta.threads
     await threads.messages.create(
         thread_id=thread.id, role='user', content=text
     )
     display(f"\n{text}\n")
     first = True
-    async for event in stream_a_run(threads.runs, function_tool_args=[env],
-        thread_id=thread.id, assistant_id=assistant.id
-    ):
-        match event:
-            case str(token):
-                display(token, sync=first)
-                first = False
-            case Run(status=status, usage=usage):
-                state.status = status
-                if status in ('completed', 'failed', 'cancelled', 'expired'):
-                    state.usage += usage
-                get_app().invalidate()
-
-
-def add_text(text_area: TextArea, text: str, sync=False) -> None:
-    text_area.document = Document(
-        text=text_area.text + text,
-        cursor_position=len(text_area.text) if sync else text_area.document.cursor_position
-    )
+    try:
+        async for event in coalesce(stream_a_run(threads.runs,
+            function_tool_args=[env],
+            thread_id=thread.id, assistant_id=assistant.id
+        )):
+            match event:
+                case str(token):
+                    display(token, sync=first)
+                    first = False
+                    if speaker:
+                        speaker.feed(token)
+                case Run(status=status, usage=usage):
+                    state.status = status
+                    # Tools may play audio themselves while the run waits.
+                    if speaker and status != 'in_progress':
+                        speaker.end()
+                    if status in ('completed', 'failed', 'cancelled', 'expired'):
+                        state.usage += usage
+                    get_app().invalidate()
+    finally:
+        # An open utterance would hold the audio sink forever.
+        if speaker:
+            speaker.end()
+
+
+def add_text(transcript: Transcript, text: str, sync=False) -> None:
+    if sync:
+        transcript.cursor = transcript.end
+    transcript.append(text)
+    app = get_app()
     if sync:
-        get_app().layout.focus(text_area)
+        app.layout.focus(transcript)
+    app.invalidate()
 
 
 @dataclass
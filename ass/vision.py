@@ -1,26 +1,49 @@
-from asyncio import run
+from asyncio import (Semaphore, as_completed, create_task, gather,
+                     get_running_loop, run, to_thread)
 from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob, has_magic
+import hashlib
 from io import BytesIO
+import json
+import multiprocessing
+import os
+import sys
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
-from click import File, argument, command, option, pass_obj
-from PIL import Image
+from click import ClickException, argument, command, open_file, option, pass_obj
+from PIL import ExifTags, Image
 
+from ass.cache import Cache
 
-@command(help="Obtain an image description.")
+
+cache = Cache("~/.cache/ass/descriptions.sqlite", max_size=16 << 20)
+
+
+@command(help="""Obtain image descriptions.
+
+Several files (or glob patterns) are described concurrently, results are
+printed as JSON lines in the order they complete.
+""")
 @option('--instructions',
         help="Instructions for the vision model.",
         default="""Describe the image in detail.""",
         show_default=True
 )
-@option('--model',
-        help="Which model to use for image description.",
-        default='gpt-4o-2024-08-06',
+@option('--model', multiple=True,
+        help="Which model to use for image description.  "
+             "Repeat to spread descriptions across several models.",
+        default=['gpt-4o-2024-08-06'],
         show_default=True
 )
 @option('-n',
         default=1,
         help="Number of initial descriptions to generate."
 )
+@option('--quorum', type=int,
+        help="Request descriptions separately and summarize as soon as "
+             "this many arrived, cancelling the rest."
+)
 @option('--summary-instructions',
         help="Instructions for the summarizer.",
         default="""You will be given several descriptions of the same picture from different sources.  Your task is to create a coheren and concise summary of the picture.""",
@@ -31,50 +54,249 @@ from PIL import Image
         default='gpt-4o-2024-08-06',
         show_default=True
 )
-@option('--temperature',
-        help="Temperature (a value between 0.0 and 2.0).",
-        default=0.8,
+@option('--temperature', type=float, multiple=True,
+        help="Temperature (a value between 0.0 and 2.0).  "
+             "Repeat to spread descriptions across several temperatures.",
+        default=[0.8],
+        show_default=True
+)
+@option('--concurrency',
+        help="Maximum number of concurrent requests.",
+        default=8,
         show_default=True
 )
-@argument("file", type=File('rb'))
+@option('--processes', type=int,
+        help="Number of processes decoding images.  [default: CPU count]"
+)
+@argument("files", nargs=-1, required=True)
 @pass_obj
-def describe_image(client, file, **kwargs):
-    print(run(adescribe(client.openai, image_url(file), **kwargs)))
+def describe_image(client, files, concurrency, processes, **kwargs):
+    def stream(token):
+        print(token, end='', flush=True)
+
+    if files == ('-',):
+        with open_file('-', 'rb') as file:
+            run(adescribe(client.openai, image_url(file), stream=stream,
+                **kwargs
+            ))
+        print()
+        return
+
+    async def describe():
+        failed = False
+        async for result in describe_files(client.openai, expand(files),
+            concurrency=concurrency, processes=processes,
+            stream=None if batch else stream, **kwargs
+        ):
+            failed = failed or 'error' in result
+            if batch:
+                print(json.dumps(result), flush=True)
+            elif 'error' in result:
+                raise ClickException(result['error'])
+            elif result.get('cached'):
+                print(result['description'])
+            else:
+                print()
+        return failed
+
+    batch = len(files) > 1 or has_magic(files[0])
+    if run(describe()):
+        sys.exit(1)
+
+
+def expand(patterns) -> List[str]:
+    return [
+        path
+        for pattern in patterns
+        for path in (
+            sorted(glob(os.path.expanduser(pattern), recursive=True))
+            if has_magic(pattern) else [pattern]
+        )
+    ]
+
 
+async def describe_files(openai, paths: List[str], /, *,
+    concurrency: int, processes=None,
+    stream: Optional[Callable[[str], None]] = None, **kwargs
+) -> AsyncIterator[Dict[str, Any]]:
+    """Describe many images, yielding results as they complete.
 
-async def adescribe(
+    Images are decoded and clipped in a process pool.  Descriptions are
+    cached by image content and the parameters used to obtain them.
+    """
+
+    params = json.dumps(kwargs, sort_keys=True)
+    semaphore = Semaphore(concurrency)
+    loop = get_running_loop()
+
+    async def describe(path):
+        async with semaphore:
+            try:
+                digest = await to_thread(file_digest, path)
+                key = hashlib.sha256(f"{digest}\0{params}".encode()).hexdigest()
+                if (description := cache.get(key)) is not None:
+                    return {'file': path, 'description': description,
+                            'cached': True}
+                url = await loop.run_in_executor(pool, encode, path)
+                description = await adescribe(openai, url, stream=stream,
+                    **kwargs
+                )
+                cache.put(key, description)
+                return {'file': path, 'description': description}
+            except Exception as error:
+                return {'file': path, 'error': f"{type(error).__name__}: {error}"}
+
+    # Forking while threads hash other files may deadlock the workers.
+    with ProcessPoolExecutor(processes,
+        mp_context=multiprocessing.get_context('forkserver')
+    ) as pool:
+        for result in as_completed([describe(path) for path in paths]):
+            yield await result
+
+
+async def adescribe(openai, image_url, /, *,
+    stream: Optional[Callable[[str], None]] = None, **kwargs
+) -> str:
+    text = []
+    async for token in describe_stream(openai, image_url, **kwargs):
+        text.append(token)
+        if stream:
+            stream(token)
+
+    return ''.join(text)
+
+
+async def describe_stream(
     openai, image_url,
-    model, instructions, n, summary_model, summary_instructions, temperature
-):
-    response = await openai.chat.completions.create(
-        model=model, max_tokens=1024, n=n, temperature=temperature,
-        messages=[dict(role='system', content=instructions),
-            dict(role='user', content=[image_url])
-        ]
+    model, instructions, n, summary_model, summary_instructions, temperature,
+    quorum=None
+) -> AsyncIterator[str]:
+    """Describe an image, streaming the summary of several descriptions.
+
+    Given several models or temperatures, or a quorum, each description is
+    requested on its own and they are spread across those models and
+    temperatures.  Summarizing starts as soon as a quorum of descriptions
+    arrived, the remaining requests are cancelled.
+    """
+
+    models = [model] if isinstance(model, str) else list(model)
+    temperatures = (
+        [temperature] if isinstance(temperature, (int, float))
+        else list(temperature)
     )
-    if len(response.choices) > 1:
+    messages = [dict(role='system', content=instructions),
+        dict(role='user', content=[image_url])
+    ]
+    if quorum is None and len(models) == len(temperatures) == 1:
         response = await openai.chat.completions.create(
-            model=summary_model, max_tokens=1024, temperature=temperature,
-            messages=[dict(role='system', content=summary_instructions),
-                *(dict(role='user', content=choice.message.content)
-                  for choice in response.choices
-                 )
-            ]
+            model=models[0], max_tokens=1024, n=n,
+            temperature=temperatures[0], messages=messages
+        )
+        descriptions = [choice.message.content for choice in response.choices]
+    else:
+        count = max(n, len(models), len(temperatures))
+
+        async def describe(index):
+            response = await openai.chat.completions.create(
+                model=models[index % len(models)], max_tokens=1024,
+                temperature=temperatures[index % len(temperatures)],
+                messages=messages
+            )
+            return response.choices[0].message.content
+
+        descriptions = await first(
+            [create_task(describe(index)) for index in range(count)],
+            min(quorum or count, count)
         )
+    if len(descriptions) == 1:
+        yield descriptions[0]
+        return
 
-    return response.choices[0].message.content
+    stream = await openai.chat.completions.create(stream=True,
+        model=summary_model, max_tokens=1024, temperature=temperatures[0],
+        messages=[dict(role='system', content=summary_instructions),
+            *(dict(role='user', content=description)
+              for description in descriptions
+             )
+        ]
+    )
+    async for chunk in stream:
+        if chunk.choices and (token := chunk.choices[0].delta.content):
+            yield token
+
+
+async def first(tasks, quorum: int) -> List[Any]:
+    """Wait for `quorum` tasks to succeed and cancel the others."""
+
+    results: List[Any] = []
+    errors: List[BaseException] = []
+    try:
+        for task in as_completed(tasks):
+            try:
+                results.append(await task)
+            except Exception as error:
+                errors.append(error)
+                if len(errors) > len(tasks) - quorum:
+                    raise errors[0]
+            if len(results) == quorum:
+                return results
+    finally:
+        for task in tasks:
+            task.cancel()
+        await gather(*tasks, return_exceptions=True)
+
+    return results
+
+
+def file_digest(path) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+def encode(path):
+    with open(path, 'rb') as file:
+        return image_url(file)
 
 
 def image_url(file):
     return dict(type="image_url",
-        image_url=dict(url=data_url(clip(Image.open(file), 2000, 768)),
-            detail="high"
-        )
+        image_url=dict(url=data_url(load(file, 2000, 768)), detail="high")
     )
 
 
-def clip(image, long, short):
-    w, h = image.size
+def load(file, long, short):
+    """Open an image at the size `clip` would produce, upright.
+
+    JPEGs are decoded at a reduced scale right away, and large images are
+    shrunk in integer steps before the final resampling, so the full
+    resolution image is never held in memory more than once.
+    """
+
+    image = Image.open(file)
+    size = fit(image.size, long, short)
+    image.draft('RGB', size)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    orientation = image.getexif().get(ExifTags.Base.Orientation)
+    if orientation in _transpose:
+        image = image.transpose(_transpose[orientation])
+
+    return image
+
+
+_transpose = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+
+def fit(size, long, short):
+    w, h = size
 
     def shrink(f, n):
         nonlocal w, h
@@ -87,13 +309,36 @@ def clip(image, long, short):
     shrink(max, long)
     shrink(min, short)
 
-    return (
-        image.resize((round(w), round(h))) if (w, h) != image.size else image
-    )
+    return (round(w), round(h))
+
+
+def clip(image, long, short):
+    size = fit(image.size, long, short)
+
+    return image.resize(size) if size != image.size else image
 
 
-def data_url(image):
+def tiles(image, long, short, max_tiles=6):
+    """Cut a tall image into pieces which `clip` does not need to shrink
+    below their width.
+    """
+
+    w, h = image.size
+    height = max(1, round(w * long / short))
+
+    return [
+        image.crop((0, top, w, min(top + height, h)))
+        for top in range(0, h, height)
+    ][:max_tiles]
+
+
+def data_url(image, format="JPEG", **params):
     buffer = BytesIO()
-    image.save(buffer, format="JPEG")
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(buffer, format=format, **params)
 
-    return f"data:image/jpeg;base64,{b64encode(buffer.getvalue()).decode()}"
+    return (
+        f"data:image/{format.lower()};base64,"
+        f"{b64encode(buffer.getbuffer()).decode()}"
+    )
@@ -1,8 +1,11 @@
 ass-ask-zsh() {
-  local transform=(
-    command ass ask --instructions "$ASS_ASK_ZSH_INSTRUCTIONS" --result
-    $ASS_ASK_ZSH_TOOLS
+  local args=(
+    --instructions "$ASS_ASK_ZSH_INSTRUCTIONS" --result ${=ASS_ASK_ZSH_TOOLS}
   )
+  local transform=(command ass ask "${args[@]}")
+  if [[ -S "$ASS_SOCKET" ]]
+  then transform=("$ASS_PYTHON" -S "$ASS_CLIENT" "${args[@]}")
+  fi
   if [[ -n "$BUFFER" ]]
   then out="$(mktemp)"
        BUFFER="$("${transform[@]}" <<< "$BUFFER" 2>"$out")"
@@ -0,0 +1,144 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+from openai.types.beta.vector_stores import VectorStoreFileBatch
+
+from ass import oai
+from ass.oai import file_counts, make_assistant, poll
+
+
+def batch(status, completed, total=3):
+    return VectorStoreFileBatch(
+        id='vsfb_1', created_at=0, object='vector_store.files_batch',
+        status=status, vector_store_id='vs_1',
+        file_counts={
+            'cancelled': 0, 'completed': completed, 'failed': 0,
+            'in_progress': total - completed, 'total': total
+        }
+    )
+
+
+class FakeFileBatches:
+    """Report a batch as in progress for a number of retrievals."""
+
+    def __init__(self, pending=3, total=3):
+        self.pending = pending
+        self.total = total
+        self.retrieved = 0
+
+    async def create(self, *, vector_store_id, file_ids):
+        return batch('in_progress', 0, self.total)
+
+    async def retrieve(self, batch_id, *, vector_store_id):
+        self.retrieved += 1
+        if self.retrieved < self.pending:
+            return batch('in_progress', self.retrieved, self.total)
+
+        return batch('completed', self.total, self.total)
+
+
+class FakeVectorStores:
+    def __init__(self, file_batches):
+        self.file_batches = file_batches
+
+    async def create(self):
+        return SimpleNamespace(id='vs_1')
+
+
+class FakeResource:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.created = 0
+
+    async def create(self, **kwargs):
+        self.created += 1
+        return SimpleNamespace(id=f"{self.prefix}_{self.created}")
+
+    async def delete(self, id, **kwargs):
+        pass
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the delays poll sleeps for without actually waiting."""
+
+    recorded = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        recorded.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(oai, 'sleep', sleep)
+
+    return recorded
+
+
+def test_backoff(delays):
+    batches = FakeFileBatches(pending=6)
+    result = asyncio.run(poll(
+        lambda: batches.retrieve('vsfb_1', vector_store_id='vs_1'),
+        until=lambda batch: batch.status != 'in_progress',
+        interval=0.1, max_interval=0.5, backoff=2.0, jitter=0.1
+    ))
+
+    assert result.status == 'completed'
+    assert batches.retrieved == 6
+    assert len(delays) == 5
+    for delay, expected in zip(delays, [0.1, 0.2, 0.4, 0.5, 0.5]):
+        assert expected * 0.9 <= delay <= expected * 1.1
+
+
+def test_timeout():
+    batches = FakeFileBatches(pending=1000)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(poll(
+            lambda: batches.retrieve('vsfb_1', vector_store_id='vs_1'),
+            until=lambda batch: batch.status != 'in_progress',
+            interval=0.01, timeout=0.1
+        ))
+    assert 1 < batches.retrieved < 1000
+
+
+def test_progress(delays):
+    batches = FakeFileBatches(pending=3)
+    reports = []
+    asyncio.run(poll(
+        lambda: batches.retrieve('vsfb_1', vector_store_id='vs_1'),
+        until=lambda batch: batch.status != 'in_progress',
+        progress=lambda batch: reports.append(file_counts(batch))
+    ))
+
+    assert reports == [
+        "in_progress: 1/3 files indexed",
+        "in_progress: 2/3 files indexed",
+        "completed: 3/3 files indexed"
+    ]
+
+
+def test_make_assistant_polls_vector_store(delays, monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    batches = FakeFileBatches(pending=3, total=1)
+    openai = SimpleNamespace(
+        beta=SimpleNamespace(
+            assistants=FakeResource('asst'),
+            vector_stores=FakeVectorStores(batches)
+        ),
+        files=FakeResource('file')
+    )
+    openai.with_options = lambda **kwargs: openai
+    messages = []
+
+    async def main():
+        async with make_assistant(openai, [io.BytesIO(b"text")],
+            instructions="", model='gpt-4o', file_search=True,
+            cache_file=tmp_path / 'assistants.json', progress=messages.append
+        ) as assistant:
+            return assistant
+
+    assert asyncio.run(main()).id == 'asst_1'
+    assert batches.retrieved == 3
+    assert messages[-1] == "completed: 1/1 files indexed"
@@ -0,0 +1,60 @@
+"""Guard the cold start of the commands bound to shell keys.
+
+Every run imports `ass` in a fresh interpreter with `-X importtime` and
+checks which modules were loaded and how long importing took in total.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = {
+    'aiosmtplib', 'bs4', 'geopy', 'markdownify', 'PIL', 'playwright',
+    'prompt_toolkit', 'z3'
+}
+
+SCRIPT = """
+from ass import cli
+try:
+    cli({args!r}, prog_name='ass')
+except SystemExit:
+    pass
+"""
+
+
+def import_times(args, home):
+    """Return the top-level packages of all imported modules, and the total
+    import time in seconds."""
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(args=args)],
+        env={**os.environ, 'HOME': str(home)}, capture_output=True, text=True,
+        check=True
+    )
+    packages = set()
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        packages.add(name.strip().split('.')[0])
+        # Nested imports are indented and part of their importer's time.
+        if not name[1:].startswith(' '):
+            total += int(cumulative) / 1e6
+
+    return packages, total
+
+
+@pytest.mark.parametrize('args, budget, heavy', [
+    (['--help'], 0.5, HEAVY | {'openai', 'pydantic'}),
+    (['ask', '--help'], 2.0, HEAVY),
+])
+def test_cold_start(tmp_path, args, budget, heavy):
+    # The first run builds the tool manifest, which imports every tool.
+    import_times(args, tmp_path)
+    packages, total = import_times(args, tmp_path)
+
+    assert not heavy & packages
+    assert total < budget